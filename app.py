@@ -1,18 +1,14 @@
 from fastapi import FastAPI, WebSocket, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.websockets import WebSocketDisconnect
 import uvicorn
 import json
-from voice_recorder import VoiceRecorder
-from app.services.llm_analyzer import LLMAnalyzer
-from app.services.excel_service import ExcelService
-import base64
 import os
 from dotenv import load_dotenv
 import asyncio
-import threading
 import logging
+from typing import Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -22,121 +18,230 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 app = FastAPI()
-recorder = VoiceRecorder()
-llm_analyzer = LLMAnalyzer()
-excel_service = ExcelService()
+
+class Services:
+    """Everything the WebSocket handler needs.
+
+    Building these imports pandas, numpy, scipy and boto3 and reads settings,
+    so it runs in a worker thread after the server is already listening
+    (see ``warm_up``) instead of at import time.
+    """
+
+    def __init__(self):
+        from voice_recorder import VoiceRecorder
+        from app.services.llm_analyzer import LLMAnalyzer
+        from app.services.excel_service import ExcelService
+        from app.services.submission_log import SubmissionCompactor
+        from app.services.transcription import create_transcriber
+        from app.services.pipeline import ProcessingPipeline
+        from app.services.session_manager import SessionManager
+
+        self.recorder = VoiceRecorder()
+        self.llm_analyzer = LLMAnalyzer()
+        self.excel_service = ExcelService()
+        self.settings = self.excel_service.settings
+        self.transcriber = create_transcriber()
+        self.pipeline = ProcessingPipeline(
+            self.recorder,
+            self.transcriber,
+            self.llm_analyzer,
+            self.excel_service,
+            max_sessions=self.settings.max_concurrent_sessions,
+            max_workers=self.settings.pipeline_max_workers,
+            stage_concurrency=self.settings.pipeline_stage_concurrency
+        )
+        self.sessions = SessionManager(max_seconds=self.settings.max_recording_seconds)
+        self.browser_audio = self.settings.audio_source == 'browser'
+        self.compactor = SubmissionCompactor(
+            self.excel_service.compact_submissions,
+            self.settings.excel_compaction_interval_seconds
+        )
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Export the caches' own counters at scrape time"""
+        from app.core.metrics import CACHE_REQUESTS
+        from app.services.workbook_cache import get_workbook_cache
+
+        def cache_requests():
+            workbook = get_workbook_cache().stats()
+            analysis = self.llm_analyzer.cache.stats()
+            return {
+                ('workbook', 'hit'): workbook['hits'],
+                ('workbook', 'miss'): workbook['misses'],
+                ('analysis', 'memory_hit'): analysis['memory_hits'],
+                ('analysis', 'store_hit'): analysis['store_hits'],
+                ('analysis', 'miss'): analysis['misses']
+            }
+
+        CACHE_REQUESTS.set_function(cache_requests)
+
+_services: Optional[asyncio.Task] = None
+
+async def _build_services() -> Services:
+    global _services
+    try:
+        services = await asyncio.to_thread(Services)
+    except Exception:
+        logger.exception("Failed to build services")
+        # Forget the failed attempt so the next caller retries instead of re-raising forever
+        if _services is asyncio.current_task():
+            _services = None
+        raise
+    if services.settings.excel_write_mode == 'log':
+        logger.info("Starting submission log compactor")
+        services.compactor.start()
+    logger.info("Services ready")
+    return services
+
+def warm_up() -> asyncio.Task:
+    """Start building the services in the background (idempotent)"""
+    global _services
+    if _services is None:
+        _services = asyncio.create_task(_build_services())
+    return _services
+
+async def get_services() -> Services:
+    """The services, waiting for the background warm-up if it has not finished"""
+    return await asyncio.shield(warm_up())
 
 # Serve static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+@app.on_event("startup")
+async def start_warm_up():
+    warm_up()
+
+@app.on_event("shutdown")
+async def stop_services():
+    if _services is None:
+        return
+    try:
+        services = await _services
+    except Exception:
+        # Already logged by _build_services; there is nothing to stop
+        return
+    services.compactor.stop()
+    services.pipeline.shutdown()
+    services.excel_service.close()
+
 @app.get("/", response_class=HTMLResponse)
 async def get():
     with open("static/index.html") as f:
         return f.read()
 
+@app.get("/stats")
+async def stats():
+    from app.services.workbook_cache import get_workbook_cache
+    services = await get_services()
+    llm_analyzer = services.llm_analyzer
+    return {
+        "workbook_cache": get_workbook_cache().stats(),
+        "analysis_cache": llm_analyzer.cache.stats(),
+        "bedrock_usage": dict(llm_analyzer.invoker.usage_totals, calls=llm_analyzer.invoker.calls),
+        "active_sessions": services.pipeline.active_sessions,
+        "connected_sessions": len(services.sessions)
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    from app.core.metrics import REGISTRY
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("WebSocket connection established")
+    services = await get_services()
+    pipeline, recorder, sessions = services.pipeline, services.recorder, services.sessions
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    session = sessions.create() if services.browser_audio else None
+    
+    async def notify(message):
+        try:
+            await websocket.send_json(message)
+        except Exception as e:
+            logger.warning(f"Could not send {message.get('status')} to client: {e}")
+    
+    def send_partial(text, is_final):
+        # Called from the capture/transcription threads, so hop onto the socket's loop
+        asyncio.run_coroutine_threadsafe(notify({
+            "status": "partial_transcript",
+            "transcript": text,
+            "is_final": is_final
+        }), loop)
     
     try:
         while True:
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                # Binary frames carry microphone audio from the browser
+                if session:
+                    session.feed(message["bytes"])
+                continue
+            data = json.loads(message["text"])
             logger.info(f"Received WebSocket action: {data['action']}")
             
             if data["action"] == "start_recording":
-                await websocket.send_json({
-                    "status": "recording_started"
-                })
-                logger.info("Started recording")
-                
-                def record():
+                if session and session.recording:
+                    await websocket.send_json({
+                        "status": "error",
+                        "message": "A recording is already in progress."
+                    })
+                    continue
+                if session:
+                    # Validated before a slot is reserved, so a bad request cannot hold one
                     try:
-                        logger.info("Recording audio...")
-                        recording = recorder.record_audio()
-                        if recording is None:
-                            logger.error("Failed to record audio")
-                            asyncio.run(websocket.send_json({
-                                "status": "error",
-                                "message": "Failed to record audio. Please try again."
-                            }))
-                            return
-                        
-                        # Save to temporary file first
-                        logger.info("Saving audio to temporary file...")
-                        temp_file = recorder.save_audio(recording, "recording.wav")
-                        
-                        # Upload to S3
-                        logger.info("Uploading to S3...")
-                        s3_uri = recorder.upload_to_s3(temp_file)
-                        
-                        if s3_uri:
-                            # Transcribe
-                            logger.info("Starting transcription...")
-                            asyncio.run(websocket.send_json({
-                                "status": "transcribing"
-                            }))
-                            
-                            transcript = recorder.transcribe_audio(s3_uri)
-                            if transcript:
-                                # Save transcript
-                                logger.info("Saving transcript to S3...")
-                                transcript_uri = recorder.save_transcript_to_s3(transcript)
-                                
-                                # Analyze with LLM
-                                logger.info("Analyzing transcript with LLM...")
-                                asyncio.run(websocket.send_json({
-                                    "status": "analyzing"
-                                }))
-                                
-                                analysis = llm_analyzer.analyze_transcript(transcript)
-                                logger.info(f"Analysis results: {json.dumps(analysis, indent=2)}")
-                                
-                                # Submit to Excel in S3
-                                logger.info("Submitting to Excel in S3...")
-                                excel_submitted = excel_service.submit_response(analysis)
-                                
-                                asyncio.run(websocket.send_json({
-                                    "status": "success",
-                                    "transcript": transcript,
-                                    "audio_uri": s3_uri,
-                                    "transcript_uri": transcript_uri,
-                                    "analysis": analysis,
-                                    "excel_submitted": excel_submitted
-                                }))
-                                logger.info("Processing completed successfully")
-                            else:
-                                logger.error("Transcription failed")
-                                asyncio.run(websocket.send_json({
-                                    "status": "error",
-                                    "message": "Failed to transcribe audio. Please try again."
-                                }))
-                        else:
-                            logger.error("Failed to upload to S3")
-                            asyncio.run(websocket.send_json({
-                                "status": "error",
-                                "message": "Failed to upload audio to S3. Please try again."
-                            }))
-                    except Exception as e:
-                        logger.error(f"Error during processing: {str(e)}")
-                        asyncio.run(websocket.send_json({
-                            "status": "error",
-                            "message": f"An error occurred: {str(e)}"
-                        }))
+                        session.start(data.get("sample_rate"))
+                    except ValueError as e:
+                        await websocket.send_json({"status": "error", "message": str(e)})
+                        continue
+                if not pipeline.try_acquire():
+                    logger.warning("Rejecting recording, pipeline is at capacity")
+                    if session:
+                        session.stop()
+                    await websocket.send_json({
+                        "status": "busy",
+                        "message": "The server is busy. Please try again shortly."
+                    })
+                    continue
                 
-                # Start recording in a separate thread
-                threading.Thread(target=record).start()
+                # The slot belongs to this handler until the pipeline task takes it over
+                try:
+                    await websocket.send_json({
+                        "status": "recording_started",
+                        "audio_source": services.settings.audio_source
+                    })
+                    logger.info("Started recording")
+                    task = asyncio.create_task(pipeline.process(notify, send_partial, session))
+                except BaseException:
+                    pipeline.release()
+                    raise
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
                 
             elif data["action"] == "stop_recording":
                 logger.info("Stopping recording")
-                recorder.stop_recording()
+                if session:
+                    session.stop()
+                else:
+                    recorder.stop_recording()
                 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
+        # Nobody is left to stop a capture that is still running
+        if tasks and not session:
+            recorder.stop_recording()
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
         if websocket.client_state.CONNECTED:
             await websocket.close()
+    finally:
+        if session:
+            sessions.close(session)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
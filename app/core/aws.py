@@ -0,0 +1,89 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+from app.core.config import get_settings
+
+# Per-service overrides merged into the shared client config. Bedrock calls
+# are already rate limited and retried by BedrockInvoker, so botocore must
+# not retry them a second time.
+SERVICE_CONFIG = {
+    'bedrock-runtime': Config(retries={'mode': 'standard', 'total_max_attempts': 1})
+}
+
+_lock = threading.Lock()
+_session: Optional[boto3.session.Session] = None
+_clients: Dict[Tuple[str, str], Any] = {}
+
+def get_session() -> boto3.session.Session:
+    """The process-wide boto3 session, created on first use"""
+    global _session
+    with _lock:
+        if _session is None:
+            settings = get_settings()
+            _session = boto3.session.Session(
+                aws_access_key_id=settings.aws_access_key_id,
+                aws_secret_access_key=settings.aws_secret_access_key,
+                region_name=settings.aws_region
+            )
+        return _session
+
+def client_config(service_name: str) -> Config:
+    """Pooled keep-alive connections with adaptive client-side retries"""
+    settings = get_settings()
+    config = Config(
+        max_pool_connections=settings.aws_max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=settings.aws_connect_timeout_seconds,
+        read_timeout=settings.aws_read_timeout_seconds,
+        retries={'mode': 'adaptive', 'total_max_attempts': settings.aws_max_attempts}
+    )
+    if service_name in SERVICE_CONFIG:
+        config = config.merge(SERVICE_CONFIG[service_name])
+    return config
+
+def get_client(service_name: str, region_name: Optional[str] = None):
+    """Shared client for a service and region; boto3 clients are safe to use across threads"""
+    region_name = region_name or get_settings().aws_region
+    key = (service_name, region_name)
+    client = _clients.get(key)
+    if client is None:
+        session = get_session()
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = session.client(service_name, region_name=region_name, config=client_config(service_name))
+                _clients[key] = client
+    return client
+
+def set_client(service_name: str, client, region_name: Optional[str] = None):
+    """Install a client (for example an in-process fake) that get_client will return"""
+    region_name = region_name or get_settings().aws_region
+    with _lock:
+        _clients[(service_name, region_name)] = client
+
+class LazyClient:
+    """Stands in for a boto3 client and builds the shared one on first use"""
+
+    def __init__(self, service_name: str, region_name: Optional[str] = None):
+        self._service_name = service_name
+        self._region_name = region_name
+
+    def __getattr__(self, name: str):
+        return getattr(get_client(self._service_name, self._region_name), name)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._service_name!r}, {self._region_name!r})"
+
+def lazy_client(service_name: str, region_name: Optional[str] = None) -> LazyClient:
+    """Client proxy for services constructed at import or startup time"""
+    return LazyClient(service_name, region_name)
+
+def reset_clients():
+    """Drop the shared session and clients, e.g. after settings change"""
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import validator
 
 class Settings(BaseSettings):
@@ -8,6 +8,11 @@ class Settings(BaseSettings):
     aws_region: str = "us-east-1"
     aws_access_key_id: str
     aws_secret_access_key: str
+    # Shared client tuning, see app/core/aws.py
+    aws_max_pool_connections: int = 32
+    aws_max_attempts: int = 5
+    aws_connect_timeout_seconds: int = 5
+    aws_read_timeout_seconds: int = 60
     
     # S3 Settings
     s3_bucket: str = "demo-bucket-986123"
@@ -15,8 +20,112 @@ class Settings(BaseSettings):
     s3_transcripts_prefix: str = "transcripts/"
     s3_excel_file: str = "source/GoogleSheet/CarSale.xlsx"
     
+    # Form Routing Settings
+    # Car make (case-insensitive, "*" for any other make) to the forms that receive it
+    form_routes: Dict[str, List[str]] = {"bmw": ["MSForm1"], "tesla": ["MSForm2"]}
+    
+    # Workbook Storage Settings
+    # "direct" rewrites the workbook on every submission, "batched" coalesces
+    # concurrent submissions into conditional writes, "log" appends NDJSON
+    # segments that are compacted into the workbook later
+    excel_write_mode: str = "direct"
+    s3_submissions_log_prefix: str = "source/submissions/"
+    excel_compaction_interval_seconds: int = 300
+    excel_batch_window_seconds: float = 0.25
+    excel_batch_max_rows: int = 500
+    excel_write_max_retries: int = 5
+    workbook_cache_max_entries: int = 16
+    # "streaming" writes workbooks row by row into a multipart upload with bounded
+    # memory, "buffered" builds the whole file in memory first
+    excel_export_mode: str = "streaming"
+    
+    # Analytics Settings
+    # Every submission is also written to a Parquet dataset partitioned by date and car make
+    parquet_sink_enabled: bool = True
+    s3_parquet_prefix: str = "analytics/submissions/"
+    # Submissions are buffered so each partition gets one file per window, not one per submission
+    parquet_flush_seconds: float = 60.0
+    parquet_flush_max_rows: int = 5000
+    
+    # Transcription Settings
+    # "batch" runs an Amazon Transcribe job after upload, "streaming" sends audio
+    # to Amazon Transcribe while recording, "fake" replays fake_transcript locally
+    transcription_backend: str = "batch"
+    fake_transcript: str = (
+        "Hi, my first name is John, my middle name is Paul, and my last name is Smith. "
+        "My date of birth is 12th March 1985. I'm interested in a car make Tesla and model Model 3. "
+        "My post code is SW1A 1AA."
+    )
+    
+    # Google Sheets Settings
+    # "gspread" appends to the spreadsheet, "fake" keeps rows in memory for offline runs.
+    # Rows are buffered and appended in batches under the Sheets write quota
+    google_sheets_backend: str = "gspread"
+    google_service_account_file: str = "service-account.json"
+    google_spreadsheet_id: Optional[str] = None
+    google_sheets_writes_per_minute: int = 60
+    google_sheets_batch_window_seconds: float = 1.0
+    google_sheets_batch_max_rows: int = 500
+    google_sheets_max_retries: int = 6
+    
     # LLM Settings
     bedrock_model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0"
+    bedrock_requests_per_minute: int = 50
+    bedrock_tokens_per_minute: int = 200000
+    bedrock_max_retries: int = 6
+    bedrock_max_concurrency: int = 8
+    # Stream the model response and send each extracted field to the client as it completes
+    bedrock_streaming: bool = False
+    # Mark the static instructions as a prompt cache checkpoint on models that support it
+    bedrock_prompt_caching: bool = True
+    bedrock_batch_role_arn: Optional[str] = None
+    s3_bedrock_batch_prefix: str = "bedrock-batch/"
+    
+    # Audio Settings
+    # "browser" records each caller's microphone in the page, "server" uses the host's microphone
+    audio_source: str = "browser"
+    max_recording_seconds: int = 300
+    # Recordings are resampled to mono 16-bit at this rate before upload;
+    # "wav", "flac" or "ogg" (Opus), the last two need the soundfile package
+    audio_encoding: str = "wav"
+    audio_upload_sample_rate: int = 16000
+    # Recordings are uploaded from memory; larger ones are split into concurrent multipart parts
+    s3_multipart_threshold_bytes: int = 8 * 1024 * 1024
+    s3_multipart_part_bytes: int = 8 * 1024 * 1024
+    s3_upload_max_concurrency: int = 4
+    # Leading and trailing silence is trimmed before encoding, keeping vad_padding_ms around
+    # the speech. A frame is speech when its level reaches vad_threshold_db (dBFS), or
+    # vad_noise_margin_db above the noise floor if that is higher
+    vad_trim_enabled: bool = True
+    vad_frame_ms: int = 30
+    vad_threshold_db: float = -45.0
+    vad_noise_margin_db: float = 12.0
+    vad_padding_ms: int = 300
+    # Stop recording after this many seconds of silence following speech; 0 waits for "stop"
+    vad_auto_stop_seconds: float = 0
+    
+    # Metrics Settings
+    # Include per-stage seconds in each session's final "success" message
+    metrics_session_timings: bool = True
+    
+    # Local Extraction Settings
+    # Fields the regex/gazetteer extractor scores at or above the threshold are not sent to Bedrock
+    pre_extraction_enabled: bool = True
+    pre_extraction_confidence_threshold: int = 85
+    
+    # Analysis Cache Settings
+    # "memory" keeps results in-process only, "disk" and "s3" also persist them
+    analysis_cache_backend: str = "disk"
+    analysis_cache_dir: str = ".cache/analysis"
+    s3_analysis_cache_prefix: str = "cache/analysis/"
+    analysis_cache_ttl_seconds: int = 7 * 24 * 3600
+    analysis_cache_max_entries: int = 1024
+    analysis_cache_max_disk_entries: int = 10000
+    
+    # Pipeline Settings
+    max_concurrent_sessions: int = 4
+    pipeline_max_workers: int = 16
+    pipeline_stage_concurrency: int = 4
     
     # Application Settings
     debug: bool = False
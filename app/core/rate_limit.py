@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Callers reserve tokens up front and sleep off any deficit, so a large
+    request is delayed rather than rejected and waiting callers are served
+    in arrival order.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, amount: float) -> "TokenBucket":
+        """Bucket that allows ``amount`` per minute with a one-minute burst"""
+        return cls(amount / 60.0, amount)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take tokens now and return how long the caller must wait before using them"""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        """Give back tokens that were over-reserved (a negative amount charges extra)"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def acquire(self, amount: float = 1):
+        """Block until ``amount`` tokens are available"""
+        wait = self.reserve(amount)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1):
+        """Wait on the event loop until ``amount`` tokens are available"""
+        wait = self.reserve(amount)
+        if wait:
+            await asyncio.sleep(wait)
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalise_transcript(transcript: str) -> str:
+    """Collapse whitespace and case so trivially different transcripts share a key"""
+    return " ".join(transcript.split()).casefold()
+
+def cache_key(transcript: str, model_id: str, prompt_version: str) -> str:
+    """Content address of an analysis: normalised transcript, model and prompt version"""
+    material = "\0".join([prompt_version, model_id, normalise_transcript(transcript)])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class _DiskStore:
+    """Persistent tier kept as one JSON file per key, evicting the oldest files.
+
+    The entry count is tracked in memory, so the directory is only scanned
+    when the cap is exceeded, and each eviction frees a tenth of the cap.
+    """
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._count = len(self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _entries(self):
+        return [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry['stored_at'], entry['value']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, stored_at: float, value: str):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stored_at': stored_at, 'value': value}, f)
+        existed = os.path.exists(path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            return
+        with self._lock:
+            self._count -= 1
+
+    def _evict(self):
+        entries = self._entries()
+        keep = self.max_entries - max(1, self.max_entries // 10)
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        removed = 0
+        for entry in entries[:max(0, len(entries) - keep)]:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        self._count = len(entries) - removed
+
+class _S3Store:
+    """Persistent tier kept as one object per key under an S3 prefix.
+
+    Size is bounded by TTL; pair the prefix with an S3 lifecycle rule to
+    remove expired objects.
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+            entry = json.loads(response['Body'].read())
+            return entry['stored_at'], entry['value']
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        except Exception as e:
+            logger.warning(f"Error reading analysis cache entry {key}: {e}")
+            return None
+
+    def put(self, key: str, stored_at: float, value: str):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{key}.json",
+            Body=json.dumps({'stored_at': stored_at, 'value': value}).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+    def delete(self, key: str):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+
+class AnalysisCache:
+    """Two-tier cache of transcript analyses: an in-memory LRU in front of a disk or S3 store"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 86400, store=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, value: str):
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of a cached analysis, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and self._expired(entry[0]):
+                del self._memory[key]
+                entry = None
+            if entry:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[1])
+
+        entry = self.store.get(key) if self.store else None
+        if entry and self._expired(entry[0]):
+            try:
+                self.store.delete(key)
+            except Exception as e:
+                logger.warning(f"Error deleting expired analysis cache entry {key}: {e}")
+            entry = None
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(key, *entry)
+        with self._lock:
+            self.store_hits += 1
+        return json.loads(entry[1])
+
+    def put(self, key: str, analysis: Dict[str, Any]):
+        """Store an analysis in both tiers"""
+        stored_at = time.time()
+        value = json.dumps(analysis)
+        self._remember(key, stored_at, value)
+        if self.store:
+            try:
+                self.store.put(key, stored_at, value)
+            except Exception as e:
+                logger.warning(f"Error writing analysis cache entry {key}: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for monitoring"""
+        with self._lock:
+            hits = self.memory_hits + self.store_hits
+            total = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0,
+                'entries': len(self._memory)
+            }
+
+def create_analysis_cache(settings, s3_client=None) -> AnalysisCache:
+    """Build the cache selected by ANALYSIS_CACHE_BACKEND (memory, disk or s3)"""
+    store = None
+    if settings.analysis_cache_backend == 'disk':
+        store = _DiskStore(settings.analysis_cache_dir, settings.analysis_cache_max_disk_entries)
+    elif settings.analysis_cache_backend == 's3' and s3_client is not None:
+        store = _S3Store(s3_client, settings.s3_bucket, settings.s3_analysis_cache_prefix)
+    return AnalysisCache(
+        max_entries=settings.analysis_cache_max_entries,
+        ttl_seconds=settings.analysis_cache_ttl_seconds,
+        store=store
+    )
@@ -0,0 +1,64 @@
+import threading
+from typing import Optional
+
+import numpy as np
+
+class AudioBuffer:
+    """Growable, preallocated sample arena that audio callbacks write into directly.
+
+    Capacity doubles when full, so appends are amortised O(1) and the
+    recording never exists as a list of small blocks that needs a final
+    ``np.concatenate``. ``view()`` returns a slice of the arena, not a copy.
+    """
+
+    def __init__(self, channels: int = 1, dtype=np.float32, initial_frames: int = 44100 * 30,
+                 max_frames: Optional[int] = None):
+        self.channels = channels
+        self.max_frames = max_frames
+        self._data = np.empty((max(1, initial_frames), channels), dtype=dtype)
+        self._length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def full(self) -> bool:
+        """True once ``max_frames`` samples have been stored"""
+        return self.max_frames is not None and self._length >= self.max_frames
+
+    def _grow(self, required: int):
+        capacity = len(self._data)
+        while capacity < required:
+            capacity *= 2
+        if self.max_frames is not None:
+            capacity = min(capacity, self.max_frames)
+        grown = np.empty((capacity, self.channels), dtype=self._data.dtype)
+        grown[:self._length] = self._data[:self._length]
+        self._data = grown
+
+    def write(self, block: np.ndarray) -> int:
+        """Append a block of samples; returns the number of frames stored"""
+        block = block.reshape(-1, self.channels)
+        with self._lock:
+            frames = len(block)
+            if self.max_frames is not None:
+                frames = min(frames, self.max_frames - self._length)
+            if frames <= 0:
+                return 0
+            end = self._length + frames
+            if end > len(self._data):
+                self._grow(end)
+            self._data[self._length:end] = block[:frames]
+            self._length = end
+            return frames
+
+    def view(self) -> np.ndarray:
+        """Return the recorded samples as a view into the arena"""
+        with self._lock:
+            return self._data[:self._length]
+
+    def clear(self):
+        """Discard recorded samples, keeping the allocated capacity"""
+        with self._lock:
+            self._length = 0
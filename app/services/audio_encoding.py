@@ -0,0 +1,138 @@
+import io
+import logging
+import os
+import struct
+import tempfile
+from math import gcd
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File extension and Amazon Transcribe MediaFormat for each supported encoding
+ENCODINGS = {
+    'wav': ('.wav', 'wav'),
+    'flac': ('.flac', 'flac'),
+    'ogg': ('.ogg', 'ogg')
+}
+
+CONTENT_TYPES = {
+    'wav': 'audio/wav',
+    'flac': 'audio/flac',
+    'ogg': 'audio/ogg'
+}
+
+def media_format_for(uri: str) -> str:
+    """Transcribe MediaFormat matching an uploaded file's extension"""
+    for extension, media_format in ENCODINGS.values():
+        if uri.lower().endswith(extension):
+            return media_format
+    return 'wav'
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    """Average the channels of a (frames, channels) recording"""
+    if samples.ndim == 2:
+        return samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    return samples
+
+def to_float(samples: np.ndarray) -> np.ndarray:
+    """Float32 samples in [-1, 1]"""
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32, copy=False)
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Polyphase resampling, which filters and decimates in one vectorised pass"""
+    if source_rate == target_rate:
+        return samples
+    from scipy.signal import resample_poly
+    divisor = gcd(int(source_rate), int(target_rate))
+    return resample_poly(samples, target_rate // divisor, source_rate // divisor).astype(np.float32)
+
+def to_int16(samples: np.ndarray) -> np.ndarray:
+    """Clip float samples to [-1, 1] and scale to 16-bit PCM"""
+    if samples.dtype == np.int16:
+        return samples
+    return np.clip(samples * 32767.0, -32768, 32767).astype(np.int16)
+
+def wav_header(frames: int, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """44-byte RIFF header for ``frames`` frames of little-endian PCM"""
+    data_size = frames * channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate,
+        sample_rate * channels * sample_width, channels * sample_width, sample_width * 8,
+        b'data', data_size
+    )
+
+class AudioEncoder:
+    """Converts captured audio to the compact form uploaded to S3.
+
+    Recordings are mixed down to mono, resampled to ``sample_rate`` and
+    stored as 16-bit WAV, FLAC or Ogg/Opus. Transcribe does not need more
+    than 16 kHz mono, so this cuts upload size several times over compared
+    with 44.1 kHz float32 WAV. FLAC and Ogg/Opus require ``soundfile``.
+    """
+
+    def __init__(self, encoding: str = 'wav', sample_rate: int = 16000):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported audio encoding: {encoding} (expected one of {', '.join(ENCODINGS)})")
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+
+    @property
+    def extension(self) -> str:
+        return ENCODINGS[self.encoding][0]
+
+    @property
+    def media_format(self) -> str:
+        return ENCODINGS[self.encoding][1]
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPES[self.encoding]
+
+    def prepare(self, recording: np.ndarray, source_rate: int) -> np.ndarray:
+        """Mono 16-bit PCM at the target sample rate"""
+        samples = to_float(to_mono(np.asarray(recording)))
+        return to_int16(resample(samples, source_rate, self.sample_rate))
+
+    def encode_buffers(self, recording: np.ndarray, source_rate: int) -> Tuple[List[memoryview], str]:
+        """Encode in memory; returns the file as a list of buffers plus the media format.
+
+        WAV output is the header followed by a view of the sample array, so
+        the samples are never copied into a single bytes object.
+        """
+        pcm = self.prepare(recording, source_rate)
+        if self.encoding == 'wav':
+            pcm = pcm.astype('<i2', copy=False)
+            buffers = [memoryview(wav_header(len(pcm), self.sample_rate)), memoryview(pcm).cast('B')]
+        else:
+            import soundfile
+            out = io.BytesIO()
+            subtype = 'PCM_16' if self.encoding == 'flac' else 'OPUS'
+            soundfile.write(out, pcm, self.sample_rate, format=self.encoding.upper(), subtype=subtype)
+            buffers = [out.getbuffer()]
+        return buffers, self.media_format
+
+    def encode(self, recording: np.ndarray, source_rate: int) -> Tuple[str, str]:
+        """Write the recording to a temporary file; returns (path, media format)"""
+        pcm = self.prepare(recording, source_rate)
+        with tempfile.NamedTemporaryFile(suffix=self.extension, delete=False) as temp_file:
+            path = temp_file.name
+        if self.encoding == 'wav':
+            from scipy.io.wavfile import write
+            write(path, self.sample_rate, pcm)
+        else:
+            import soundfile
+            if self.encoding == 'flac':
+                soundfile.write(path, pcm, self.sample_rate, format='FLAC', subtype='PCM_16')
+            else:
+                soundfile.write(path, pcm, self.sample_rate, format='OGG', subtype='OPUS')
+        logger.info(
+            f"Encoded {len(pcm) / self.sample_rate:.1f}s of audio as {self.encoding} "
+            f"at {self.sample_rate} Hz ({recording.nbytes} -> {os.path.getsize(path)} bytes)"
+        )
+        return path, self.media_format
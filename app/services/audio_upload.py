@@ -0,0 +1,126 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+from app.core.metrics import UPLOADED_BYTES
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file over a sequence of buffers, without joining them.
+
+    boto3 reads request bodies through ``read``/``seek`` (it rewinds on
+    retries and for checksums), so a list of memoryviews can be uploaded
+    directly from the arrays that own the data.
+    """
+
+    def __init__(self, buffers: Sequence[memoryview]):
+        self._buffers = [memoryview(buffer).cast('B') for buffer in buffers]
+        self._starts = []
+        offset = 0
+        for buffer in self._buffers:
+            self._starts.append(offset)
+            offset += len(buffer)
+        self._size = offset
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, target) -> int:
+        target = memoryview(target).cast('B')
+        written = 0
+        for start, buffer in zip(self._starts, self._buffers):
+            end = start + len(buffer)
+            if written >= len(target):
+                break
+            if self._pos >= end:
+                continue
+            offset = self._pos - start
+            count = min(len(buffer) - offset, len(target) - written)
+            target[written:written + count] = buffer[offset:offset + count]
+            written += count
+            self._pos += count
+        return written
+
+    def slice(self, start: int, end: int) -> "BufferReader":
+        """Reader over bytes [start, end) that shares the same buffers"""
+        views = []
+        for buffer_start, buffer in zip(self._starts, self._buffers):
+            lo = max(start, buffer_start) - buffer_start
+            hi = min(end, buffer_start + len(buffer)) - buffer_start
+            if hi > lo:
+                views.append(buffer[lo:hi])
+        return BufferReader(views)
+
+class AudioUploader:
+    """Uploads in-memory audio to S3 with no temporary file.
+
+    Small recordings go up in a single ``put_object``. Above
+    ``multipart_threshold`` bytes the file is split into parts that are
+    uploaded concurrently; a failed upload is aborted so no orphaned parts
+    are left behind.
+    """
+
+    def __init__(self, s3_client, bucket: str, multipart_threshold: int = 8 * 1024 * 1024,
+                 part_size: int = 8 * 1024 * 1024, max_concurrency: int = 4):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.multipart_threshold = multipart_threshold
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.max_concurrency = max_concurrency
+
+    def upload(self, buffers: List[memoryview], key: str, content_type: str = 'application/octet-stream') -> str:
+        """Upload the concatenated buffers to ``key`` and return its S3 URI"""
+        body = BufferReader(buffers)
+        if len(body) < self.multipart_threshold:
+            self.s3_client.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+        else:
+            self._upload_multipart(body, key, content_type)
+        UPLOADED_BYTES.inc(len(body), kind='audio')
+        return f"s3://{self.bucket}/{key}"
+
+    def _upload_multipart(self, body: BufferReader, key: str, content_type: str):
+        upload_id = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket, Key=key, ContentType=content_type
+        )['UploadId']
+
+        def upload_part(number: int, start: int):
+            part = body.slice(start, min(start + self.part_size, len(body)))
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=part
+            )
+            return {'PartNumber': number, 'ETag': response['ETag']}
+
+        offsets = range(0, len(body), self.part_size)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part") as pool:
+                parts = list(pool.map(upload_part, range(1, len(offsets) + 1), offsets))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+            )
+        except Exception:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+        logger.info(f"Uploaded {len(body)} bytes to {key} in {len(parts)} parts")
@@ -0,0 +1,234 @@
+import io
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from botocore.exceptions import ClientError
+
+from app.core.metrics import RETRIES
+from app.core.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_ERRORS = (
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException'
+)
+
+# Token counters reported by Anthropic models, including prompt cache reads and writes
+USAGE_FIELDS = (
+    'input_tokens',
+    'output_tokens',
+    'cache_read_input_tokens',
+    'cache_creation_input_tokens'
+)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used for rate limiting"""
+    return max(1, len(text) // 4)
+
+class BedrockInvoker:
+    """Calls ``invoke_model`` under request and token per-minute limits.
+
+    Throttling responses are retried with full-jitter exponential backoff so
+    concurrent callers do not retry in lock-step.
+    """
+
+    def __init__(self, runtime_client, requests_per_minute: float = 50,
+                 tokens_per_minute: float = 200000, max_retries: int = 6,
+                 base_delay: float = 0.5, max_delay: float = 20.0):
+        self.runtime = runtime_client
+        self.request_bucket = TokenBucket.per_minute(requests_per_minute)
+        self.token_bucket = TokenBucket.per_minute(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.calls = 0
+        self.usage_totals = {field: 0 for field in USAGE_FIELDS}
+        self._usage_lock = threading.Lock()
+
+    def _call(self, operation: Callable[..., Dict[str, Any]], model_id: str,
+              body: Dict[str, Any], estimated_tokens: int) -> Dict[str, Any]:
+        self.request_bucket.acquire(1)
+        self.token_bucket.acquire(estimated_tokens)
+        attempt = 0
+        while True:
+            try:
+                return operation(modelId=model_id, body=json.dumps(body))
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in THROTTLING_ERRORS or attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                self.retries += 1
+                RETRIES.inc(operation='bedrock')
+                logger.warning(f"Bedrock throttled ({code}), retrying in {delay:.2f}s (attempt {attempt})")
+                time.sleep(delay)
+
+    def _settle(self, estimated_tokens: int, usage: Dict[str, int]):
+        with self._usage_lock:
+            self.calls += 1
+            for field in USAGE_FIELDS:
+                self.usage_totals[field] += usage.get(field) or 0
+        logger.info(
+            "Bedrock usage: "
+            + ", ".join(f"{field}={usage.get(field) or 0}" for field in USAGE_FIELDS)
+        )
+        used = sum(usage.get(field) or 0 for field in USAGE_FIELDS)
+        if used:
+            # Settle the estimate against what the model actually consumed
+            self.token_bucket.refund(estimated_tokens - used)
+
+    def invoke(self, model_id: str, body: Dict[str, Any], estimated_tokens: int) -> Dict[str, Any]:
+        """Invoke a model and return the decoded response body"""
+        response = self._call(self.runtime.invoke_model, model_id, body, estimated_tokens)
+        response_body = json.loads(response['body'].read())
+        self._settle(estimated_tokens, response_body.get('usage') or {})
+        return response_body
+
+    def invoke_stream(self, model_id: str, body: Dict[str, Any], estimated_tokens: int) -> Iterator[str]:
+        """Invoke a model with response streaming and yield text deltas as they arrive"""
+        response = self._call(self.runtime.invoke_model_with_response_stream, model_id, body, estimated_tokens)
+        usage: Dict[str, int] = {}
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json.loads(chunk['bytes'])
+            if payload.get('type') == 'content_block_delta':
+                text = payload.get('delta', {}).get('text')
+                if text:
+                    yield text
+            elif payload.get('type') == 'message_start':
+                usage.update(payload.get('message', {}).get('usage', {}))
+            elif payload.get('type') == 'message_delta':
+                usage.update(payload.get('usage', {}))
+        self._settle(estimated_tokens, usage)
+
+class BedrockBatchRunner:
+    """Bulk analysis through Bedrock batch inference: JSONL in and out via S3"""
+
+    def __init__(self, bedrock_client, s3_client, bucket: str, prefix: str, role_arn: str):
+        self.bedrock = bedrock_client
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.role_arn = role_arn
+
+    def submit(self, model_id: str, bodies: Dict[str, Dict[str, Any]], job_name: Optional[str] = None) -> str:
+        """Upload one JSONL record per request body and start a batch job; returns the job ARN"""
+        job_name = job_name or f"analysis-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        input_key = f"{self.prefix}{job_name}/input.jsonl"
+        lines = [json.dumps({'recordId': record_id, 'modelInput': body}) for record_id, body in bodies.items()]
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=input_key,
+            Body=("\n".join(lines) + "\n").encode('utf-8'),
+            ContentType='application/jsonl'
+        )
+        response = self.bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=model_id,
+            inputDataConfig={'s3InputDataConfig': {'s3Uri': f"s3://{self.bucket}/{input_key}"}},
+            outputDataConfig={'s3OutputDataConfig': {'s3Uri': f"s3://{self.bucket}/{self.prefix}{job_name}/output/"}}
+        )
+        logger.info(f"Started Bedrock batch job {job_name} with {len(lines)} record(s)")
+        return response['jobArn']
+
+    def status(self, job_arn: str) -> str:
+        """Return the job status (Submitted, InProgress, Completed, Failed, ...)"""
+        return self.bedrock.get_model_invocation_job(jobIdentifier=job_arn)['status']
+
+    def results(self, job_arn: str) -> Dict[str, Dict[str, Any]]:
+        """Read the model outputs of a completed job keyed by record ID"""
+        job = self.bedrock.get_model_invocation_job(jobIdentifier=job_arn)
+        output_uri = job['outputDataConfig']['s3OutputDataConfig']['s3Uri']
+        output_prefix = output_uri.split(f"s3://{self.bucket}/", 1)[1]
+        results = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=output_prefix):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('.jsonl.out'):
+                    continue
+                body = self.s3_client.get_object(Bucket=self.bucket, Key=obj['Key'])['Body'].read()
+                for line in body.decode('utf-8').splitlines():
+                    if line.strip():
+                        record = json.loads(line)
+                        if 'modelOutput' in record:
+                            results[record['recordId']] = record['modelOutput']
+        return results
+
+class StubBedrockRuntime:
+    """In-process stand-in for the bedrock-runtime client.
+
+    ``respond`` maps the decoded request body to the model's text output.
+    ``latency`` seconds are added to every call and every ``throttle_every``-th
+    call raises ThrottlingException, which is enough to exercise the limiter
+    and retry paths without AWS.
+    """
+
+    def __init__(self, respond: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 latency: float = 0.0, throttle_every: int = 0):
+        self.respond = respond or (lambda body: '{}')
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.calls = 0
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    def _respond(self, operation: str, body: str):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.throttle_every and call % self.throttle_every == 0:
+            raise ClientError(
+                {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}},
+                operation
+            )
+        request = json.loads(body)
+        text = self.respond(request)
+        usage = {
+            'input_tokens': estimate_tokens(json.dumps(request.get('messages', []))),
+            'output_tokens': estimate_tokens(text),
+            'cache_read_input_tokens': 0,
+            'cache_creation_input_tokens': 0
+        }
+        for block in request.get('system', []):
+            tokens = estimate_tokens(block.get('text', ''))
+            if 'cache_control' not in block:
+                usage['input_tokens'] += tokens
+            elif block['text'] in self._cached_prefixes:
+                usage['cache_read_input_tokens'] += tokens
+            else:
+                self._cached_prefixes.add(block['text'])
+                usage['cache_creation_input_tokens'] += tokens
+        return text, usage
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        text, usage = self._respond('InvokeModel', body)
+        payload = {'content': [{'type': 'text', 'text': text}], 'usage': usage}
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str, chunk_size: int = 16,
+                                          **kwargs) -> Dict[str, Any]:
+        text, usage = self._respond('InvokeModelWithResponseStream', body)
+        input_usage = {field: count for field, count in usage.items() if field != 'output_tokens'}
+        events = [{'type': 'message_start', 'message': {'usage': input_usage}}]
+        events.extend(
+            {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': text[i:i + chunk_size]}}
+            for i in range(0, len(text), chunk_size)
+        )
+        events.append({'type': 'message_delta', 'usage': {'output_tokens': usage['output_tokens']}})
+        events.append({'type': 'message_stop'})
+        return {'body': ({'chunk': {'bytes': json.dumps(event).encode('utf-8')}} for event in events)}
@@ -1,9 +1,14 @@
 import pandas as pd
-import boto3
-from typing import Dict, Any, Tuple
-import io
+from typing import Dict, Any, List
 import logging
+import threading
+from app.core.aws import lazy_client
 from app.core.config import get_settings
+from app.services.form_routing import ColumnMapper, FormRouter, full_name
+from app.services.parquet_sink import ParquetBuffer, ParquetSink
+from app.services.submission_log import SubmissionLog
+from app.services.workbook_batcher import WorkbookBatcher
+from app.services.workbook_store import WorkbookStore
 
 logger = logging.getLogger(__name__)
 
@@ -37,146 +42,213 @@ class ExcelService:
         'Pin Code'
     ]
 
+    MSFORMS_PREFIX = 'destination/msforms/'
+    MSFORM1_KEY = f'{MSFORMS_PREFIX}MSForm1.xlsx'
+    MSFORM2_KEY = f'{MSFORMS_PREFIX}MSForm2.xlsx'
+
+    # Columns of each destination form; routed forms not listed here use MSFORM1_COLUMNS
+    FORM_COLUMNS = {
+        'MSForm1': MSFORM1_COLUMNS,
+        'MSForm2': MSFORM2_COLUMNS
+    }
+
+    # Accepted column names for each field copied to a destination form
+    FORM_FIELDS = {
+        'name': ['Full Name', 'Name'],
+        'date_of_birth': ['DOB', 'Date of Birth'],
+        'car_make': ['Car Make'],
+        'car_model': ['Car Model'],
+        'post_code': ['Pin Code', 'Post Code']
+    }
+
     def __init__(self):
         self.settings = get_settings()
-        self.s3_client = boto3.client('s3',
-            aws_access_key_id=self.settings.aws_access_key_id,
-            aws_secret_access_key=self.settings.aws_secret_access_key,
-            region_name=self.settings.aws_region
+        self.s3_client = lazy_client('s3')
+        self.submission_log = SubmissionLog(
+            self.s3_client,
+            self.settings.s3_bucket,
+            self.settings.s3_submissions_log_prefix
         )
+        self._compaction_lock = threading.Lock()
+        self.router = FormRouter(self.settings.form_routes)
+        self.column_mapper = ColumnMapper(self.FORM_FIELDS)
+        self.store = WorkbookStore(self.s3_client, self.settings.s3_bucket)
+        self.parquet_sink = None
+        self.parquet_buffer = None
+        if self.settings.parquet_sink_enabled:
+            self.parquet_sink = ParquetSink(
+                self.s3_client,
+                self.settings.s3_bucket,
+                self.settings.s3_parquet_prefix
+            )
+            self.parquet_buffer = ParquetBuffer(
+                self.parquet_sink,
+                window_seconds=self.settings.parquet_flush_seconds,
+                max_rows=self.settings.parquet_flush_max_rows
+            )
+        self.batcher = None
+        if self.settings.excel_write_mode == 'batched':
+            self.batcher = WorkbookBatcher(
+                self.store,
+                window_seconds=self.settings.excel_batch_window_seconds,
+                max_rows=self.settings.excel_batch_max_rows,
+                max_retries=self.settings.excel_write_max_retries
+            )
         
     def _get_excel_from_s3(self, key: str, columns: list) -> pd.DataFrame:
         """Fetch Excel file from S3 and return as DataFrame"""
-        try:
-            response = self.s3_client.get_object(
-                Bucket=self.settings.s3_bucket,
-                Key=key
-            )
-            buffer = io.BytesIO(response['Body'].read())
-            buffer.seek(0)  # Reset buffer position
-            try:
-                df = pd.read_excel(buffer)
-                return df
-            except Exception as excel_error:
-                logger.error(f"Error reading Excel content from {key}: {excel_error}")
-                # Create new DataFrame with correct columns if file is corrupted
-                return pd.DataFrame(columns=columns)
-        except self.s3_client.exceptions.NoSuchKey:
-            logger.warning(f"Excel file not found at {key}, creating new one with correct columns")
-            return pd.DataFrame(columns=columns)
+        df, _ = self.store.read(key, columns)
+        return df
             
     def _save_excel_to_s3(self, df: pd.DataFrame, key: str) -> bool:
         """Save DataFrame back to S3 as Excel"""
         try:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False)
-            buffer.seek(0)
-            
-            self.s3_client.put_object(
-                Bucket=self.settings.s3_bucket,
-                Key=key,
-                Body=buffer.getvalue(),
-                ContentType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
+            self.store.write(df, key)
             logger.info(f"Successfully saved Excel file to S3: {key}")
             return True
         except Exception as e:
             logger.error(f"Error saving Excel to S3 {key}: {e}")
             return False
 
+    def _workbooks(self) -> Dict[str, list]:
+        """Map each managed workbook key to its columns"""
+        workbooks = {self.settings.s3_excel_file: self.SOURCE_COLUMNS}
+        for form in self.router.forms:
+            workbooks[self._form_key(form)] = self._form_columns(form)
+        return workbooks
+
+    def _form_key(self, form: str) -> str:
+        return f"{self.MSFORMS_PREFIX}{form}.xlsx"
+
+    def _form_columns(self, form: str) -> list:
+        return self.FORM_COLUMNS.get(form, self.MSFORM1_COLUMNS)
+
+    def _append_rows(self, key: str, columns: list, rows: List[Dict[str, Any]]) -> bool:
+        """Append rows to a workbook, either directly or through the submission log"""
+        if self.settings.excel_write_mode == 'log':
+            return self.submission_log.append(key, rows)
+        if self.batcher:
+            return self.batcher.submit(key, columns, rows).result()
+        df = self._get_excel_from_s3(key, columns)
+        df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+        return self._save_excel_to_s3(df, key)
+
+    def compact_submissions(self) -> Dict[str, int]:
+        """Materialise pending submission log segments into the workbooks"""
+        counts = {}
+        with self._compaction_lock:
+            for key, columns in self._workbooks().items():
+                counts[key] = 0
+                segment_keys = self.submission_log.list_segments(key)
+                if not segment_keys:
+                    continue
+                rows = self.submission_log.read_segments(segment_keys)
+                df = self._get_excel_from_s3(key, columns)
+                df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+                if self._save_excel_to_s3(df, key):
+                    # Only delete what was listed; newer segments wait for the next pass
+                    self.submission_log.delete_segments(segment_keys)
+                    counts[key] = len(rows)
+        return counts
+
     def _clean_car_model(self, model: str) -> str:
         """Clean car model name to remove prefixes"""
         # Remove 'Model ' prefix if present
         return model.replace('Model ', '') if 'Model ' in model else model
 
-    def _format_for_msform1(self, row_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Format data for MSForm1 (BMW) format"""
-        # Combine names for Full Name
-        full_name = f"{row_data['First Name']} {row_data['Middle Name']} {row_data['Last Name']}".replace('Not provided', '').strip()
+    def _form_fields(self, row_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fields copied from a source row to the destination forms"""
         return {
-            'Full Name': full_name,
-            'DOB': row_data['DOB'],
-            'Car Make': row_data['Car Make'],
-            'Car Model': self._clean_car_model(row_data['Car Model']),
-            'Pin Code': row_data['Post Code']
+            'name': full_name(row_data['First Name'], row_data['Middle Name'], row_data['Last Name']),
+            'date_of_birth': row_data['DOB'],
+            'car_make': row_data['Car Make'],
+            'car_model': self._clean_car_model(row_data['Car Model']),
+            'post_code': row_data['Post Code']
         }
 
-    def _format_for_msform2(self, row_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Format data for MSForm2 (Tesla) format"""
-        # Combine names for Name
-        name = f"{row_data['First Name']} {row_data['Middle Name']} {row_data['Last Name']}".replace('Not provided', '').strip()
+    def _copy_to_forms(self, rows: List[Dict[str, Any]]) -> List[Dict[str, bool]]:
+        """Copy source rows to the forms routed for their car make, one write per form"""
+        results = [{form: False for form in self.router.forms} for _ in rows]
+        for form, indices in self.router.group(row['Car Make'] for row in rows).items():
+            columns = self._form_columns(form)
+            try:
+                fields = pd.DataFrame([self._form_fields(rows[i]) for i in indices])
+                formatted = self.column_mapper.rows(fields, columns).to_dict('records')
+                success = self._append_rows(self._form_key(form), columns, formatted)
+                logger.info(f"Data copied to {form}.xlsx ({len(indices)} row(s))")
+            except Exception as e:
+                logger.error(f"Error copying to {form}: {e}")
+                success = False
+            for i in indices:
+                results[i][form] = success
+        return results
+
+    def _row_data(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Source workbook row with exact column names"""
         return {
-            'Name': name,
-            'DOB': row_data['DOB'],
-            'Car Make': row_data['Car Make'],
-            'Car Model': self._clean_car_model(row_data['Car Model']),
-            'Pin Code': row_data['Post Code']
+            'First Name': analysis['customer']['first_name'],
+            'Middle Name': analysis['customer'].get('middle_name', 'Not provided'),
+            'Last Name': analysis['customer']['last_name'],
+            'DOB': analysis['date_of_birth'],
+            'Car Make': analysis['vehicle']['make'],
+            'Car Model': analysis['vehicle']['model'],
+            'Post Code': analysis['post_code']
         }
 
-    def _copy_to_msforms(self, row_data: Dict[str, Any], car_make: str) -> Tuple[bool, bool]:
-        """Copy data to appropriate MS Form based on car make"""
-        msform1_success = False
-        msform2_success = False
+    def _failed_result(self) -> Dict[str, bool]:
+        return {'source_success': False, **{f"{form.lower()}_success": False for form in self.router.forms}}
+
+    def submit_many(self, analyses: List[Dict[str, Any]]) -> List[Dict[str, bool]]:
+        """Submit many analyses, appending to the source and each destination form once"""
+        results = [self._failed_result() for _ in analyses]
+        
+        # An incomplete analysis fails on its own instead of failing the whole batch
+        valid, rows = [], []
+        for index, analysis in enumerate(analyses):
+            try:
+                rows.append(self._row_data(analysis))
+                valid.append(index)
+            except (KeyError, TypeError, AttributeError) as e:
+                logger.error(f"Skipping analysis {index} with missing or malformed field: {e}")
+        if not rows:
+            return results
         
         try:
-            if car_make.lower() == 'bmw':
-                # Format data for MSForm1 and save
-                msform1_key = 'destination/msforms/MSForm1.xlsx'
-                df_msform1 = self._get_excel_from_s3(msform1_key, self.MSFORM1_COLUMNS)
-                formatted_data = self._format_for_msform1(row_data)
-                df_msform1 = pd.concat([df_msform1, pd.DataFrame([formatted_data])], ignore_index=True)
-                msform1_success = self._save_excel_to_s3(df_msform1, msform1_key)
-                logger.info("Data copied to MSForm1.xlsx (BMW)")
-                
-            elif car_make.lower() == 'tesla':
-                # Format data for MSForm2 and save
-                msform2_key = 'destination/msforms/MSForm2.xlsx'
-                df_msform2 = self._get_excel_from_s3(msform2_key, self.MSFORM2_COLUMNS)
-                formatted_data = self._format_for_msform2(row_data)
-                df_msform2 = pd.concat([df_msform2, pd.DataFrame([formatted_data])], ignore_index=True)
-                msform2_success = self._save_excel_to_s3(df_msform2, msform2_key)
-                logger.info("Data copied to MSForm2.xlsx (Tesla)")
-                
-        except Exception as e:
-            logger.error(f"Error copying to MS Forms: {e}")
-            
-        return msform1_success, msform2_success
-            
-    def submit_response(self, analysis: Dict[str, Any]) -> Dict[str, bool]:
-        """Submit analysis data to Excel files in S3"""
-        try:
-            # Get existing Excel file or create new one with correct columns
-            source_df = self._get_excel_from_s3(self.settings.s3_excel_file, self.SOURCE_COLUMNS)
-            
-            # Prepare row data with exact column names
-            row_data = {
-                'First Name': analysis['customer']['first_name'],
-                'Middle Name': analysis['customer'].get('middle_name', 'Not provided'),
-                'Last Name': analysis['customer']['last_name'],
-                'DOB': analysis['date_of_birth'],
-                'Car Make': analysis['vehicle']['make'],
-                'Car Model': analysis['vehicle']['model'],
-                'Post Code': analysis['post_code']
-            }
-            
-            # Append new row to source file
-            source_df = pd.concat([source_df, pd.DataFrame([row_data])], ignore_index=True)
-            source_success = self._save_excel_to_s3(source_df, self.settings.s3_excel_file)
+            # Append new rows to source file
+            source_success = self._append_rows(self.settings.s3_excel_file, self.SOURCE_COLUMNS, rows)
             
             # Copy to MS Forms based on car make
-            msform1_success, msform2_success = self._copy_to_msforms(row_data, analysis['vehicle']['make'])
+            copied = self._copy_to_forms(rows)
             
-            return {
-                'source_success': source_success,
-                'msform1_success': msform1_success,
-                'msform2_success': msform2_success
-            }
+            # The full typed analysis, for analytics; the workbooks stay the system of record,
+            # so nothing is queued for a batch the source workbook rejected
+            if self.parquet_buffer is not None and source_success:
+                self.parquet_buffer.submit([analyses[index] for index in valid])
+            for index, forms in zip(valid, copied):
+                results[index] = {
+                    'source_success': source_success,
+                    **{f"{form.lower()}_success": success for form, success in forms.items()}
+                }
+            return results
             
         except Exception as e:
             logger.error(f"Error submitting to Excel: {e}")
-            return {
-                'source_success': False,
-                'msform1_success': False,
-                'msform2_success': False
-            } 
\ No newline at end of file
+            return [self._failed_result() for _ in analyses]
+            
+    def submit_response(self, analysis: Dict[str, Any]) -> Dict[str, bool]:
+        """Submit analysis data to Excel files in S3"""
+        return self.submit_many([analysis])[0]
+
+    def close(self):
+        """Write any buffered analytics records"""
+        if self.parquet_buffer is not None:
+            self.parquet_buffer.close()
+
+def main():
+    """Compact the submission log into the workbooks on demand"""
+    counts = ExcelService().compact_submissions()
+    for key, count in counts.items():
+        print(f"{key}: {count} row(s) compacted")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,37 @@
 import pandas as pd
-import boto3
-from typing import Dict, Any
+from typing import Dict, Any, List
 import logging
+import threading
+from app.core.aws import lazy_client
 from app.core.config import get_settings
+from app.services.form_routing import ColumnMapper, FormRouter, full_name
+from app.services.workbook_batcher import WorkbookBatcher
+from app.services.workbook_store import WorkbookStore
 import io
 
 logger = logging.getLogger(__name__)
 
 class FormMapper:
+    # Columns used when a form workbook has to be created from scratch
+    DEFAULT_COLUMNS = [
+        'Full Name', 'First Name', 'Middle Name', 'Last Name',
+        'Date of Birth', 'Post Code', 'Car Make', 'Car Model'
+    ]
+
     def __init__(self):
         self.settings = get_settings()
-        self.s3_client = boto3.client('s3',
-            aws_access_key_id=self.settings.aws_access_key_id,
-            aws_secret_access_key=self.settings.aws_secret_access_key,
-            region_name=self.settings.aws_region
-        )
+        self.s3_client = lazy_client('s3')
         self.bucket_name = "demo-bucket-986123"
         self.forms_prefix = "msforms/"
+        self.store = WorkbookStore(self.s3_client, self.bucket_name)
+        self.batcher = None
+        if self.settings.excel_write_mode == 'batched':
+            self.batcher = WorkbookBatcher(
+                self.store,
+                window_seconds=self.settings.excel_batch_window_seconds,
+                max_rows=self.settings.excel_batch_max_rows,
+                max_retries=self.settings.excel_write_max_retries
+            )
         
         # Define form mappings for different column names
         self.field_mappings = {
@@ -29,15 +44,27 @@ class FormMapper:
             'car_make': ['Car Make', 'Make', 'Vehicle Make', 'Car Make'],
             'car_model': ['Car Model', 'Model', 'Vehicle Model', 'Car Model']
         }
+        self.column_mapper = ColumnMapper(self.field_mappings)
+        self.router = FormRouter(self.settings.form_routes)
         
-        # Initialize Excel files if they don't exist
-        self._initialize_excel_files()
+        # Form workbooks are created on first submission rather than at construction
+        self._forms_initialized = False
+        self._init_lock = threading.Lock()
         
+    def _ensure_excel_files(self):
+        """Create the form workbooks once, on first use"""
+        if self._forms_initialized:
+            return
+        with self._init_lock:
+            if not self._forms_initialized:
+                self._initialize_excel_files()
+                self._forms_initialized = True
+
     def _initialize_excel_files(self):
         """Create Excel files if they don't exist"""
         try:
             # Check if files exist
-            for file_name in ['MSForm1.xlsx', 'MSForm2.xlsx']:
+            for file_name in [f"{form}.xlsx" for form in self.router.forms]:
                 try:
                     self.s3_client.head_object(
                         Bucket=self.bucket_name,
@@ -47,11 +74,7 @@ class FormMapper:
                     # File doesn't exist, create it
                     logger.info(f"Creating new Excel file: {file_name}")
                     # Create empty DataFrame with columns
-                    columns = [
-                        'Full Name', 'First Name', 'Middle Name', 'Last Name',
-                        'Date of Birth', 'Post Code', 'Car Make', 'Car Model'
-                    ]
-                    df = pd.DataFrame(columns=columns)
+                    df = pd.DataFrame(columns=self.DEFAULT_COLUMNS)
                     buffer = io.BytesIO()
                     df.to_excel(buffer, index=False)
                     buffer.seek(0)
@@ -67,30 +90,8 @@ class FormMapper:
     def _get_excel_from_s3(self, file_name: str) -> pd.DataFrame:
         """Fetch Excel file from S3 and return as DataFrame"""
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=f"{self.forms_prefix}{file_name}"
-            )
-            buffer = io.BytesIO(response['Body'].read())
-            buffer.seek(0)  # Reset buffer position
-            try:
-                df = pd.read_excel(buffer)
-                return df
-            except Exception as excel_error:
-                logger.error(f"Error reading Excel content: {excel_error}")
-                # If file is corrupted or empty, create new DataFrame
-                columns = [
-                    'Full Name', 'First Name', 'Middle Name', 'Last Name',
-                    'Date of Birth', 'Post Code', 'Car Make', 'Car Model'
-                ]
-                return pd.DataFrame(columns=columns)
-        except self.s3_client.exceptions.NoSuchKey:
-            logger.warning(f"Excel file {file_name} not found, creating new one")
-            columns = [
-                'Full Name', 'First Name', 'Middle Name', 'Last Name',
-                'Date of Birth', 'Post Code', 'Car Make', 'Car Model'
-            ]
-            return pd.DataFrame(columns=columns)
+            df, _ = self.store.read(f"{self.forms_prefix}{file_name}", self.DEFAULT_COLUMNS)
+            return df
         except Exception as e:
             logger.error(f"Error accessing Excel from S3: {e}")
             raise
@@ -98,100 +99,87 @@ class FormMapper:
     def _save_excel_to_s3(self, df: pd.DataFrame, file_name: str):
         """Save DataFrame back to S3 as Excel"""
         try:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False)
-            buffer.seek(0)
-            
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=f"{self.forms_prefix}{file_name}",
-                Body=buffer.getvalue(),
-                ContentType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
+            self.store.write(df, f"{self.forms_prefix}{file_name}")
             logger.info(f"Successfully saved {file_name} to S3")
         except Exception as e:
             logger.error(f"Error saving Excel to S3: {e}")
             raise
+
+    def _append_to_form(self, analyses: List[Dict[str, Any]], file_name: str) -> bool:
+        """Append analyses to a form workbook in one write, batching writes when enabled"""
+        self._ensure_excel_files()
+        if self.batcher:
+            # Rows are prepared at flush time against the workbook's current header
+            return self.batcher.submit(
+                f"{self.forms_prefix}{file_name}",
+                self.DEFAULT_COLUMNS,
+                analyses,
+                prepare=self._prepare_row_data
+            ).result()
+        df = self._get_excel_from_s3(file_name)
+        rows = self._prepare_rows(analyses, df.columns.tolist())
+        df = pd.concat([df, rows], ignore_index=True)
+        self._save_excel_to_s3(df, file_name)
+        return True
             
     def _find_matching_column(self, columns: list, field_type: str) -> str:
         """Find the matching column name from the Excel file"""
-        possible_names = self.field_mappings.get(field_type, [])
-        for name in possible_names:
-            if name in columns:
-                return name
-        return None
-            
-    def _prepare_row_data(self, analysis: Dict[str, Any], columns: list) -> Dict[str, Any]:
-        """Prepare row data according to form columns"""
-        row_data = {}
-        
-        # Handle name fields
-        if self._find_matching_column(columns, 'name'):
-            # Combine names if form has single name field
-            name_parts = [
-                analysis['customer'].get('first_name', ''),
-                analysis['customer'].get('middle_name', ''),
-                analysis['customer'].get('last_name', '')
-            ]
-            row_data[self._find_matching_column(columns, 'name')] = ' '.join(filter(None, name_parts))
-        else:
-            # Handle separate name fields
-            for name_type in ['first_name', 'middle_name', 'last_name']:
-                col = self._find_matching_column(columns, name_type)
-                if col:
-                    row_data[col] = analysis['customer'].get(name_type.replace('_', ''), '')
-        
-        # Handle other fields
-        field_mapping = {
+        return self.column_mapper.compile(columns).get(field_type)
+
+    def _row_mapping(self, columns: list) -> Dict[str, str]:
+        """Field to column mapping for a header; a single name column replaces the name parts"""
+        mapping = self.column_mapper.compile(columns)
+        if 'name' in mapping:
+            return {field: column for field, column in mapping.items()
+                    if field not in ('first_name', 'middle_name', 'last_name')}
+        return mapping
+
+    def _fields(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Logical form fields of an analysis"""
+        customer = analysis['customer']
+        vehicle = analysis['vehicle']
+        return {
+            'name': full_name(customer.get('first_name'), customer.get('middle_name'), customer.get('last_name')),
+            'first_name': customer.get('first_name', ''),
+            'middle_name': customer.get('middle_name', ''),
+            'last_name': customer.get('last_name', ''),
             'date_of_birth': analysis.get('date_of_birth', ''),
             'post_code': analysis.get('post_code', ''),
-            'car_make': analysis['vehicle'].get('make', ''),
-            'car_model': analysis['vehicle'].get('model', '')  # This should already contain "Model X"
+            'car_make': vehicle.get('make', ''),
+            'car_model': vehicle.get('model', '')
         }
-        
-        for field, value in field_mapping.items():
-            col = self._find_matching_column(columns, field)
-            if col:
-                if field == 'car_model' and not value:
-                    # Special handling for car model if it's empty
-                    make = analysis['vehicle'].get('make', '').lower()
-                    if make == 'tesla' and 'model' in analysis['vehicle']:
-                        # For Tesla, the model often includes "Model" in the name
-                        value = analysis['vehicle']['model']
-                row_data[col] = value
-                
-        logger.info(f"Prepared row data: {row_data}")  # Add logging to see what's being prepared
-        return row_data
+            
+    def _prepare_row_data(self, analysis: Dict[str, Any], columns: list) -> Dict[str, Any]:
+        """Prepare row data according to form columns"""
+        fields = self._fields(analysis)
+        return {column: fields[field] for field, column in self._row_mapping(columns).items()}
+
+    def _prepare_rows(self, analyses: List[Dict[str, Any]], columns: list) -> pd.DataFrame:
+        """Rows for many analyses, projected onto the form columns in one pass"""
+        fields = pd.DataFrame([self._fields(analysis) for analysis in analyses])
+        mapping = self._row_mapping(columns)
+        return fields[list(mapping)].rename(columns=mapping)
+
+    def submit_many(self, analyses: List[Dict[str, Any]]) -> List[Dict[str, bool]]:
+        """Submit many analyses, writing each destination form once"""
+        results = [{form: False for form in self.router.forms} for _ in analyses]
+        makes = [analysis['vehicle'].get('make', '') for analysis in analyses]
+        groups = self.router.group(makes)
+        for form, indices in groups.items():
+            try:
+                success = self._append_to_form([analyses[i] for i in indices], f"{form}.xlsx")
+                logger.info(f"Submitted {len(indices)} row(s) to {form}")
+            except Exception as e:
+                logger.error(f"Error submitting to {form}: {e}")
+                success = False
+            for i in indices:
+                results[i][form] = success
+        routed = {i for indices in groups.values() for i in indices}
+        for i, make in enumerate(makes):
+            if i not in routed:
+                logger.warning(f"Car make '{make}' doesn't match any form criteria")
+        return results
         
     def submit_to_forms(self, analysis: Dict[str, Any]) -> Dict[str, bool]:
-        """Submit data to appropriate MS Form based on car make"""
-        results = {'MSForm1': False, 'MSForm2': False}
-        car_make = analysis['vehicle'].get('make', '').lower()
-        
-        try:
-            if car_make == 'bmw':
-                # Handle BMW submission to MSForm1
-                df = self._get_excel_from_s3('MSForm1.xlsx')
-                row_data = self._prepare_row_data(analysis, df.columns.tolist())
-                df = pd.concat([df, pd.DataFrame([row_data])], ignore_index=True)
-                self._save_excel_to_s3(df, 'MSForm1.xlsx')
-                results['MSForm1'] = True
-                logger.info("Successfully submitted to MSForm1 (BMW)")
-                
-            elif car_make == 'tesla':
-                # Handle Tesla submission to MSForm2
-                df = self._get_excel_from_s3('MSForm2.xlsx')
-                row_data = self._prepare_row_data(analysis, df.columns.tolist())
-                df = pd.concat([df, pd.DataFrame([row_data])], ignore_index=True)
-                self._save_excel_to_s3(df, 'MSForm2.xlsx')
-                results['MSForm2'] = True
-                logger.info("Successfully submitted to MSForm2 (Tesla)")
-            
-            else:
-                logger.warning(f"Car make '{car_make}' doesn't match any form criteria")
-                
-        except Exception as e:
-            logger.error(f"Error submitting to MS Forms: {e}")
-            
-        return results 
\ No newline at end of file
+        """Submit data to the MS Forms routed for its car make"""
+        return self.submit_many([analysis])[0]
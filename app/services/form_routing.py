@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# Compiled mapping from a logical field to the workbook column that receives it
+ColumnMapping = Dict[str, str]
+
+class FormRouter:
+    """Declarative routing of car makes to destination forms.
+
+    ``routes`` maps a make (matched case-insensitively) to the forms that
+    should receive it, e.g. ``{"bmw": ["MSForm1"], "tesla": ["MSForm2"]}``.
+    A ``"*"`` entry receives every make that has no route of its own.
+    """
+
+    def __init__(self, routes: Dict[str, Sequence[str]]):
+        self.routes = {make.strip().lower(): list(forms) for make, forms in routes.items()}
+        self.forms = list(dict.fromkeys(form for forms in self.routes.values() for form in forms))
+
+    def destinations(self, make: Optional[str]) -> List[str]:
+        """Forms that should receive a submission for ``make``"""
+        make = (make or '').strip().lower()
+        return self.routes.get(make, self.routes.get('*', []))
+
+    def group(self, makes: Iterable[Optional[str]]) -> Dict[str, List[int]]:
+        """Indices of the submissions bound for each form, in submission order"""
+        groups: Dict[str, List[int]] = {}
+        for index, make in enumerate(makes):
+            for form in self.destinations(make):
+                groups.setdefault(form, []).append(index)
+        return groups
+
+class ColumnMapper:
+    """Resolves logical fields to workbook columns once per header.
+
+    ``field_mappings`` lists the accepted column names for each field in
+    order of preference. The resolved mapping is cached by the header's
+    column tuple, so a form's header is scanned once rather than for every
+    row of every submission.
+    """
+
+    def __init__(self, field_mappings: Dict[str, Sequence[str]]):
+        self.field_mappings = {field: list(names) for field, names in field_mappings.items()}
+        self._compiled: Dict[Tuple[str, ...], ColumnMapping] = {}
+        self._lock = threading.Lock()
+
+    def compile(self, columns: Sequence[str]) -> ColumnMapping:
+        """Mapping of each field present in ``columns`` to its column name"""
+        signature = tuple(columns)
+        mapping = self._compiled.get(signature)
+        if mapping is None:
+            present = set(signature)
+            mapping = {}
+            for field, names in self.field_mappings.items():
+                column = next((name for name in names if name in present), None)
+                if column:
+                    mapping[field] = column
+            with self._lock:
+                self._compiled[signature] = mapping
+        return mapping
+
+    def rows(self, fields: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+        """Project a frame of logical fields onto a workbook header in one pass"""
+        mapping = self.compile(columns)
+        selected = [field for field in mapping if field in fields.columns]
+        return fields[selected].rename(columns=mapping)
+
+def full_name(first: Any, middle: Any, last: Any) -> str:
+    """Join name parts, skipping blanks and "Not provided" placeholders"""
+    parts = [part for part in (first, middle, last) if part and part != 'Not provided']
+    return ' '.join(str(part) for part in parts)
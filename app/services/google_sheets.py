@@ -1,44 +1,269 @@
-from typing import Dict, Any
-import os
-import gspread
-from google.oauth2.service_account import Credentials
+import random
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
 from ..core.logger import logger
 from app.core.config import get_settings
+from app.core.metrics import RETRIES
+from app.core.rate_limit import TokenBucket
+
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive.file',
+]
+
+# Rate limits and transient server errors; anything else is not worth retrying
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+def _status(error: Exception) -> Optional[int]:
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+class FakeAPIError(Exception):
+    """Shaped like gspread's APIError: the HTTP response is on ``response``"""
+
+    class _Response:
+        def __init__(self, status_code: int):
+            self.status_code = status_code
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.response = self._Response(status_code)
+
+class FakeWorksheet:
+    """In-memory worksheet that enforces a per-minute write quota like the Sheets API"""
+
+    def __init__(self, writes_per_minute: int = 0, latency: float = 0.0):
+        self.rows: List[List[Any]] = []
+        self.writes_per_minute = writes_per_minute
+        self.latency = latency
+        self.calls = 0
+        self.rejected = 0
+        self._window: List[float] = []
+        self._lock = threading.Lock()
+
+    def _write(self, rows: List[List[Any]]):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            self._window = [started for started in self._window if now - started < 60]
+            if self.writes_per_minute and len(self._window) >= self.writes_per_minute:
+                self.rejected += 1
+                raise FakeAPIError(429, "Quota exceeded for quota metric 'Write requests'")
+            self._window.append(now)
+            self.rows.extend(list(row) for row in rows)
+
+    def append_row(self, values: List[Any], **kwargs):
+        self._write([values])
+
+    def append_rows(self, values: List[List[Any]], **kwargs):
+        self._write(values)
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet: FakeWorksheet):
+        self.sheet1 = worksheet
+
+class FakeGspreadClient:
+    """Offline stand-in for an authorised gspread client; every key opens the same spreadsheet"""
+
+    def __init__(self, worksheet: Optional[FakeWorksheet] = None):
+        self.worksheet = worksheet or FakeWorksheet()
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        return FakeSpreadsheet(self.worksheet)
+
+@lru_cache()
+def get_sheets_client():
+    """One authorised client per process, selected by GOOGLE_SHEETS_BACKEND"""
+    settings = get_settings()
+    if settings.google_sheets_backend == "fake":
+        return FakeGspreadClient(FakeWorksheet(settings.google_sheets_writes_per_minute))
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_file(settings.google_service_account_file, scopes=SCOPES)
+    return gspread.authorize(creds)
+
+@lru_cache()
+def get_worksheet(spreadsheet_id: str):
+    """First worksheet of a spreadsheet, opened once"""
+    return get_sheets_client().open_by_key(spreadsheet_id).sheet1
+
+class SheetsAppender:
+    """Write-behind buffer that appends rows to a worksheet in batches.
+
+    Rows queued within ``window_seconds`` (or until ``max_rows`` are waiting)
+    go out in one ``append_rows`` call. A larger flush is split only between
+    ``submit`` calls, and each future reports the request that carried its
+    rows. Calls are paced by a token bucket sized to the Sheets write quota,
+    and 429/5xx responses are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(self, worksheet, writes_per_minute: float = 60, window_seconds: float = 1.0,
+                 max_rows: int = 500, max_retries: int = 6, base_delay: float = 1.0,
+                 max_delay: float = 32.0):
+        self.worksheet = worksheet
+        self.bucket = TokenBucket.per_minute(writes_per_minute)
+        self.window_seconds = window_seconds
+        self.max_rows = max_rows
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Queued submissions: their rows and the future to resolve
+        self._pending: List[tuple] = []
+        self._queued_rows = 0
+        self._first_queued: Optional[float] = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sheets-appender", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: List[List[Any]]) -> Future:
+        """Queue rows; the future resolves to True once they are appended"""
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("SheetsAppender is closed")
+            if not self._pending:
+                self._first_queued = time.monotonic()
+            self._pending.append((rows, future))
+            self._queued_rows += len(rows)
+            self._condition.notify()
+        return future
+
+    def flush(self):
+        """Append every queued row now"""
+        with self._condition:
+            pending = self._take()
+        if pending:
+            self._append(pending)
+
+    def close(self):
+        """Flush queued rows and stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _take(self) -> List[tuple]:
+        pending = self._pending
+        self._pending, self._queued_rows, self._first_queued = [], 0, None
+        return pending
+
+    def _due(self) -> bool:
+        if not self._pending:
+            return False
+        return self._queued_rows >= self.max_rows or time.monotonic() - self._first_queued >= self.window_seconds
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._due() and not self._closed:
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, self._first_queued + self.window_seconds - time.monotonic())
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                pending = self._take()
+            self._append(pending)
+
+    def _requests(self, pending: List[tuple]) -> List[List[tuple]]:
+        """Group submissions into requests of at most max_rows rows, never splitting one submission"""
+        requests, current, size = [], [], 0
+        for rows, future in pending:
+            if current and size + len(rows) > self.max_rows:
+                requests.append(current)
+                current, size = [], 0
+            current.append((rows, future))
+            size += len(rows)
+        if current:
+            requests.append(current)
+        return requests
+
+    def _append(self, pending: List[tuple]):
+        for request in self._requests(pending):
+            rows = [row for submission, _ in request for row in submission]
+            success = False
+            try:
+                self._append_with_retries(rows)
+                success = True
+                logger.info(f"Appended {len(rows)} row(s) to Google Sheets")
+            except Exception as e:
+                logger.error(f"Error submitting to Google Sheets: {e}")
+            for _, future in request:
+                future.set_result(success)
+
+    def _append_with_retries(self, rows: List[List[Any]]):
+        attempt = 0
+        while True:
+            self.bucket.acquire(1)
+            try:
+                # RAW stores values as text, so transcript content starting with "=" is never run as a formula
+                self.worksheet.append_rows(rows, value_input_option='RAW')
+                return
+            except Exception as e:
+                status = _status(e)
+                if status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                RETRIES.inc(operation='google_sheets')
+                logger.warning(f"Google Sheets returned {status}, retrying in {delay:.2f}s (attempt {attempt})")
+                time.sleep(delay)
+
+@lru_cache()
+def get_sheets_appender() -> SheetsAppender:
+    """Process-wide appender, so every service instance shares one buffer and quota"""
+    settings = get_settings()
+    return SheetsAppender(
+        get_worksheet(settings.google_spreadsheet_id),
+        writes_per_minute=settings.google_sheets_writes_per_minute,
+        window_seconds=settings.google_sheets_batch_window_seconds,
+        max_rows=settings.google_sheets_batch_max_rows,
+        max_retries=settings.google_sheets_max_retries
+    )
 
 class GoogleSheetsService:
     def __init__(self):
         self.settings = get_settings()
-        scope = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive.file',
+        self.appender = get_sheets_appender()
+        self.worksheet = self.appender.worksheet
+
+    def _row_data(self, analysis: Dict[str, Any]) -> List[Any]:
+        return [
+            analysis['customer']['first_name'],
+            analysis['customer']['middle_name'] or 'Not provided',
+            analysis['customer']['last_name'],
+            analysis['date_of_birth'],
+            analysis['vehicle']['make'],
+            analysis['vehicle']['model'],
+            analysis['post_code']
         ]
-        
-        creds = Credentials.from_service_account_file(
-            self.settings.google_service_account_file, 
-            scopes=scope
-        )
-        
-        self.gc = gspread.authorize(creds)
-        self.spreadsheet = self.gc.open_by_key(self.settings.google_spreadsheet_id)
-        self.worksheet = self.spreadsheet.sheet1  # Use Sheet1 instead of custom worksheet
-        
+
+    def submit_many(self, analyses: List[Dict[str, Any]]) -> List[bool]:
+        """Append many analyses in as few API calls as the buffer allows"""
+        results = [False for _ in analyses]
+        valid, rows = [], []
+        for index, analysis in enumerate(analyses):
+            try:
+                rows.append(self._row_data(analysis))
+                valid.append(index)
+            except (KeyError, TypeError, AttributeError) as e:
+                logger.error(f"Skipping analysis {index} with missing or malformed field: {e}")
+        if not rows:
+            return results
+        success = self.appender.submit(rows).result()
+        for index in valid:
+            results[index] = success
+        return results
+
     def submit_response(self, analysis):
-        try:
-            # Prepare row data
-            row_data = [
-                analysis['customer']['first_name'],
-                analysis['customer']['middle_name'] or 'Not provided',
-                analysis['customer']['last_name'],
-                analysis['date_of_birth'],
-                analysis['vehicle']['make'],
-                analysis['vehicle']['model'],
-                analysis['post_code']
-            ]
-            
-            # Append the row
-            self.worksheet.append_row(row_data)
-            return True
-            
-        except Exception as e:
-            print(f"Error submitting to Google Sheets: {e}")
-            return False 
\ No newline at end of file
+        """Queue one analysis and wait until its batch is appended"""
+        return self.submit_many([analysis])[0]
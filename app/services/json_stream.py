@@ -0,0 +1,95 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+class IncrementalJSONParser:
+    """Parses the first JSON object in a stream of text, one top-level member at a time.
+
+    ``feed()`` accepts arbitrary chunks (any text before the opening brace is
+    skipped) and returns the ``(key, value)`` pairs whose values became
+    complete in that chunk, so callers can act on each field without waiting
+    for the rest of the object.
+    """
+
+    def __init__(self):
+        self.result: Dict[str, Any] = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._state = 'prefix'
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return newly completed top-level fields"""
+        self._text += chunk
+        fields: List[Tuple[str, Any]] = []
+        text = self._text
+        while self._pos < len(text) and not self.done:
+            c = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._state == 'key':
+                        self._key = json.loads(text[self._token_start:self._pos + 1])
+                        self._state = 'colon'
+                    elif self._depth == 0:
+                        self._complete(self._pos + 1, 'after_value', fields)
+            elif self._state == 'prefix':
+                if c == '{':
+                    self._state = 'key'
+            elif self._state == 'key':
+                if c == '"':
+                    self._in_string = True
+                    self._token_start = self._pos
+                elif c == '}':
+                    self.done = True
+            elif self._state == 'colon':
+                if c == ':':
+                    self._state = 'value'
+                    self._token_start = None
+            elif self._state == 'value':
+                if self._token_start is None:
+                    if not c.isspace():
+                        self._token_start = self._pos
+                        if c == '"':
+                            self._in_string = True
+                        elif c in '{[':
+                            self._depth = 1
+                elif c == '"':
+                    self._in_string = True
+                elif c in '{[':
+                    self._depth += 1
+                elif c in '}]':
+                    if self._depth == 0:
+                        # A scalar value closed by the end of the object
+                        self._complete(self._pos, 'done', fields)
+                    else:
+                        self._depth -= 1
+                        if self._depth == 0:
+                            self._complete(self._pos + 1, 'after_value', fields)
+                elif c == ',' and self._depth == 0:
+                    self._complete(self._pos, 'key', fields)
+            elif self._state == 'after_value':
+                if c == ',':
+                    self._state = 'key'
+                elif c == '}':
+                    self.done = True
+            self._pos += 1
+        return fields
+
+    def _complete(self, end: int, next_state: str, fields: List[Tuple[str, Any]]):
+        value = json.loads(self._text[self._token_start:end])
+        self.result[self._key] = value
+        fields.append((self._key, value))
+        self._token_start = None
+        if next_state == 'done':
+            self.done = True
+        else:
+            self._state = next_state
@@ -1,21 +1,30 @@
-import boto3
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional
+import asyncio
 import json
 import os
 from ..core.logger import logger
+from app.core.aws import lazy_client
+from app.core.config import get_settings
+from app.services.analysis_cache import cache_key, create_analysis_cache
+from app.services.bedrock_engine import BedrockBatchRunner, BedrockInvoker, estimate_tokens
+from app.services.json_stream import IncrementalJSONParser
+from app.services.pre_extractor import EXTRACTOR_VERSION, FIELD_CONFIDENCE_KEYS, PreExtractor, confident_fields
 
 class LLMAnalyzer:
-    def __init__(self):
-        self.bedrock_runtime = boto3.client(
-            service_name='bedrock-runtime',
-            region_name='us-east-1'
-        )
-        
-    def _get_analysis_prompt(self, transcript: str) -> str:
-        return f"""Human: You are an AI assistant helping to extract specific information from a customer call transcript for a car sale inquiry. Please analyze the following transcript and extract the required information in a structured format.
+    # Bump whenever the prompt changes so cached analyses are not reused
+    PROMPT_VERSION = "4"
+    MODEL_ID = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
+    # Model families that accept cache_control checkpoints on Bedrock
+    PROMPT_CACHING_MODELS = (
+        'anthropic.claude-3-7-sonnet',
+        'anthropic.claude-3-5-haiku',
+        'anthropic.claude-sonnet-4',
+        'anthropic.claude-opus-4'
+    )
 
-Transcript:
-{transcript}
+    # Static instructions sent as a cached system prompt ahead of each transcript. The worked
+    # examples keep it above the 1,024-token minimum a Claude cache checkpoint needs to take effect
+    ANALYSIS_INSTRUCTIONS = """You are an AI assistant helping to extract specific information from a customer call transcript for a car sale inquiry. Please analyze the transcript provided by the user and extract the required information in a structured format.
 
 Please extract the following information:
 1. Customer Name (First, Middle if provided, Last)
@@ -40,77 +49,321 @@ Business Logic Validation:
 - Flag any unusual patterns or potential concerns
 
 Return the information in the following JSON format:
-{{
-    "customer": {{
+{
+    "customer": {
         "first_name": "string",
         "middle_name": "string or null",
         "last_name": "string"
-    }},
-    "vehicle": {{
+    },
+    "vehicle": {
         "make": "string",
         "model": "string"
-    }},
+    },
     "date_of_birth": "YYYY-MM-DD",
     "post_code": "string",
-    "confidence_scores": {{
+    "confidence_scores": {
         "name": 0-100,
         "vehicle": 0-100,
         "dob": 0-100,
         "post_code": 0-100
-    }},
+    },
     "missing_fields": ["field1", "field2"],
     "ambiguities": ["description of any unclear information or business logic concerns"]
-}}"""
+}
+
+Worked examples:
+
+Example 1 - the caller corrects themselves and spells out the post code.
+Transcript:
+Hi, yes, I'm calling about the Golf you have listed. My name is Sarah Jane Whitmore. Whitmore, W-H-I-T-M-O-R-E. I was born on the fourth of July 1988, sorry, the fourteenth of July 1988. My post code is L S six, three A B.
+Output:
+{
+    "customer": {"first_name": "Sarah", "middle_name": "Jane", "last_name": "Whitmore"},
+    "vehicle": {"make": "Volkswagen", "model": "Golf"},
+    "date_of_birth": "1988-07-14",
+    "post_code": "LS6 3AB",
+    "confidence_scores": {"name": 95, "vehicle": 85, "dob": 90, "post_code": 90},
+    "missing_fields": [],
+    "ambiguities": ["Caller corrected the date of birth from 1988-07-04 to 1988-07-14; using the correction", "Make inferred as Volkswagen from the model name Golf"]
+}
+
+Example 2 - details are missing and the caller is under 18.
+Transcript:
+Hello, it's Tom. I'd like to book a test drive in the Tesla Model 3. My birthday is the 2nd of March 2010. I don't know my post code off the top of my head, I'm afraid.
+Output:
+{
+    "customer": {"first_name": "Tom", "middle_name": null, "last_name": "Not provided"},
+    "vehicle": {"make": "Tesla", "model": "Model 3"},
+    "date_of_birth": "2010-03-02",
+    "post_code": "Not provided",
+    "confidence_scores": {"name": 50, "vehicle": 95, "dob": 90, "post_code": 0},
+    "missing_fields": ["middle_name", "last_name", "post_code"],
+    "ambiguities": ["Customer appears to be under 18 based on the date of birth", "Only a first name was given"]
+}
+
+Example 3 - several cars are discussed and the make and model do not match.
+Transcript:
+Good afternoon, my name is Priya Raman. I was looking at the BMW X5 but I think I'd prefer the Audi Q5, actually the Audi X3. Date of birth 21/11/1979, post code SW1A 1AA.
+Output:
+{
+    "customer": {"first_name": "Priya", "middle_name": null, "last_name": "Raman"},
+    "vehicle": {"make": "Audi", "model": "X3"},
+    "date_of_birth": "1979-11-21",
+    "post_code": "SW1A 1AA",
+    "confidence_scores": {"name": 95, "vehicle": 40, "dob": 95, "post_code": 95},
+    "missing_fields": ["middle_name"],
+    "ambiguities": ["Several cars mentioned (BMW X5, Audi Q5, Audi X3); using the last one", "Audi does not make an X3 (a BMW model); the caller may have meant the Audi Q3 or the BMW X3"]
+}
+
+Example 4 - informal names for the make and a spoken date.
+Transcript:
+Hiya, Dave Okafor here, that's O-K-A-F-O-R. I'm after a Merc, the C Class estate. Born nineteen seventy-two, the thirtieth of January. Post code is M twenty, two R F.
+Output:
+{
+    "customer": {"first_name": "Dave", "middle_name": null, "last_name": "Okafor"},
+    "vehicle": {"make": "Mercedes-Benz", "model": "C-Class"},
+    "date_of_birth": "1972-01-30",
+    "post_code": "M20 2RF",
+    "confidence_scores": {"name": 90, "vehicle": 90, "dob": 85, "post_code": 85},
+    "missing_fields": ["middle_name"],
+    "ambiguities": ["'Merc' taken to mean Mercedes-Benz", "Dave may be short for David"]
+}
+
+Respond with the JSON object only."""
+
+    MAX_TOKENS = 1000
+
+    def __init__(self, bedrock_runtime=None):
+        self.settings = get_settings()
+        # A stub runtime (see bedrock_engine.StubBedrockRuntime) can be injected for offline use
+        self.bedrock_runtime = bedrock_runtime or lazy_client('bedrock-runtime')
+        self.s3_client = lazy_client('s3')
+        self.cache = create_analysis_cache(
+            self.settings,
+            self.s3_client if self.settings.analysis_cache_backend == 's3' else None
+        )
+        self.invoker = BedrockInvoker(
+            self.bedrock_runtime,
+            requests_per_minute=self.settings.bedrock_requests_per_minute,
+            tokens_per_minute=self.settings.bedrock_tokens_per_minute,
+            max_retries=self.settings.bedrock_max_retries
+        )
+        self._batch_runner = None
+        self.pre_extractor = PreExtractor()
+        
+    def _get_analysis_prompt(self, transcript: str, known: Optional[Dict[str, Any]] = None) -> str:
+        """Per-transcript part of the prompt; the instructions live in ANALYSIS_INSTRUCTIONS"""
+        prompt = f"""Transcript:
+{transcript}"""
+        if known:
+            prompt += f"""
+
+These fields were already extracted with high confidence: {json.dumps(known)}
+Do not return them. Return the JSON object with only the remaining fields, plus confidence_scores, missing_fields and ambiguities."""
+        return prompt
+
+    def _pre_extract(self, transcript: str):
+        """Run the local extractor; returns (local analysis, fields confident enough to skip)"""
+        if not self.settings.pre_extraction_enabled:
+            return None, {}
+        local = self.pre_extractor.extract(transcript)
+        return local, confident_fields(local, self.settings.pre_extraction_confidence_threshold)
+
+    def _cache_key(self, transcript: str) -> str:
+        """Cache key that also covers the pre-extraction settings, since they shape every result"""
+        version = self.PROMPT_VERSION
+        if self.settings.pre_extraction_enabled:
+            version += f"+pre-{EXTRACTOR_VERSION}@{self.settings.pre_extraction_confidence_threshold}"
+        return cache_key(transcript, self.MODEL_ID, version)
+
+    def _merge(self, local: Optional[Dict[str, Any]], known: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine locally extracted fields with the model's answer for the rest"""
+        if not known:
+            return analysis
+        merged = dict(analysis)
+        merged.update(known)
+        scores = dict(analysis.get('confidence_scores') or {})
+        for field in known:
+            score_key = FIELD_CONFIDENCE_KEYS[field]
+            scores[score_key] = local['confidence_scores'][score_key]
+        merged['confidence_scores'] = scores
+        merged['missing_fields'] = analysis.get('missing_fields', [])
+        merged['ambiguities'] = list(dict.fromkeys(local['ambiguities'] + analysis.get('ambiguities', [])))
+        return merged
 
     def analyze_transcript(self, transcript: str) -> Dict[str, Any]:
         """Analyze the transcript using Amazon Bedrock"""
+        key = self._cache_key(transcript)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info("Returning cached analysis")
+            return cached
+        
+        local, known = self._pre_extract(transcript)
+        if len(known) == len(FIELD_CONFIDENCE_KEYS):
+            logger.info("All fields extracted locally, skipping Bedrock")
+            self.cache.put(key, local)
+            return local
+        
         try:
-            prompt = self._get_analysis_prompt(transcript)
-            
-            response = self.bedrock_runtime.invoke_model(
-                modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "max_tokens": 1000,
-                    "temperature": 0.1,
-                    "top_p": 0.9
-                })
+            prompt = self._get_analysis_prompt(transcript, known)
+            response_body = self.invoker.invoke(
+                self.MODEL_ID,
+                self._request_body(prompt),
+                self._estimate_tokens(prompt)
             )
+            analysis = self._merge(local, known, self._parse_analysis(response_body))
+            self.cache.put(key, analysis)
+            return analysis
             
-            response_body = json.loads(response['body'].read())
-            content = response_body['content'][0]['text']
-            # Extract JSON from the response
-            json_str = content[content.find('{'):content.rfind('}')+1]
-            analysis = json.loads(json_str)
+        except Exception as e:
+            logger.error(f"Error analyzing transcript: {e}")
+            return self._failed_analysis(e)
+
+    def analyze_transcript_stream(self, transcript: str,
+                                  on_field: Callable[[str, Any], None]) -> Dict[str, Any]:
+        """Analyze the transcript with a streamed response, calling on_field as each top-level field completes"""
+        key = self._cache_key(transcript)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info("Returning cached analysis")
+            for field, value in cached.items():
+                on_field(field, value)
+            return cached
+        
+        local, known = self._pre_extract(transcript)
+        if len(known) == len(FIELD_CONFIDENCE_KEYS):
+            logger.info("All fields extracted locally, skipping Bedrock")
+            self.cache.put(key, local)
+            for field, value in local.items():
+                on_field(field, value)
+            return local
+        # Locally extracted fields can be shown before the model starts responding
+        for field, value in known.items():
+            on_field(field, value)
+        
+        try:
+            prompt = self._get_analysis_prompt(transcript, known)
+            parser = IncrementalJSONParser()
+            for text in self.invoker.invoke_stream(
+                self.MODEL_ID,
+                self._request_body(prompt),
+                self._estimate_tokens(prompt)
+            ):
+                for field, value in parser.feed(text):
+                    if field not in known:
+                        on_field(field, value)
+            if not parser.done:
+                raise ValueError("Model response did not contain a complete JSON object")
+            analysis = self._merge(local, known, parser.result)
+            self.cache.put(key, analysis)
             return analysis
             
         except Exception as e:
             logger.error(f"Error analyzing transcript: {e}")
-            return {
-                "error": str(e),
-                "customer": {
-                    "first_name": "Not provided",
-                    "middle_name": None,
-                    "last_name": "Not provided"
-                },
-                "vehicle": {
-                    "make": "Not provided",
-                    "model": "Not provided"
-                },
-                "date_of_birth": "Not provided",
-                "post_code": "Not provided",
-                "confidence_scores": {
-                    "name": 0,
-                    "vehicle": 0,
-                    "dob": 0,
-                    "post_code": 0
-                },
-                "missing_fields": ["all"],
-                "ambiguities": ["Failed to analyze transcript"]
-            } 
\ No newline at end of file
+            return self._failed_analysis(e)
+
+    def _supports_prompt_caching(self) -> bool:
+        # Strip cross-region inference profile prefixes such as "us."
+        model = self.MODEL_ID.split('.', 1)[1] if self.MODEL_ID.split('.', 1)[0] in ('us', 'eu', 'apac') else self.MODEL_ID
+        return model.startswith(self.PROMPT_CACHING_MODELS)
+
+    def _estimate_tokens(self, prompt: str) -> int:
+        """Upper bound on the tokens a call will consume, for rate limiting"""
+        return estimate_tokens(self.ANALYSIS_INSTRUCTIONS) + estimate_tokens(prompt) + self.MAX_TOKENS
+
+    def _request_body(self, prompt: str) -> Dict[str, Any]:
+        """Build the Anthropic messages request: cached instructions plus the per-transcript prompt"""
+        system = {"type": "text", "text": self.ANALYSIS_INSTRUCTIONS}
+        if self.settings.bedrock_prompt_caching and self._supports_prompt_caching():
+            system["cache_control"] = {"type": "ephemeral"}
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "system": [system],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "max_tokens": self.MAX_TOKENS,
+            "temperature": 0.1,
+            "top_p": 0.9
+        }
+
+    def _parse_analysis(self, response_body: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the JSON analysis from a model response"""
+        content = response_body['content'][0]['text']
+        # Extract JSON from the response
+        json_str = content[content.find('{'):content.rfind('}')+1]
+        return json.loads(json_str)
+
+    def _failed_analysis(self, error: Exception) -> Dict[str, Any]:
+        """Placeholder analysis returned when the model call fails"""
+        return {
+            "error": str(error),
+            "customer": {
+                "first_name": "Not provided",
+                "middle_name": None,
+                "last_name": "Not provided"
+            },
+            "vehicle": {
+                "make": "Not provided",
+                "model": "Not provided"
+            },
+            "date_of_birth": "Not provided",
+            "post_code": "Not provided",
+            "confidence_scores": {
+                "name": 0,
+                "vehicle": 0,
+                "dob": 0,
+                "post_code": 0
+            },
+            "missing_fields": ["all"],
+            "ambiguities": ["Failed to analyze transcript"]
+        }
+
+    async def analyze_many(self, transcripts: List[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Analyze transcripts concurrently, in input order, within the configured rate limits"""
+        semaphore = asyncio.Semaphore(concurrency or self.settings.bedrock_max_concurrency)
+
+        async def analyze(transcript: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await asyncio.to_thread(self.analyze_transcript, transcript)
+
+        return await asyncio.gather(*(analyze(transcript) for transcript in transcripts))
+
+    @property
+    def batch_runner(self) -> BedrockBatchRunner:
+        """Bedrock batch inference runner (requires BEDROCK_BATCH_ROLE_ARN)"""
+        if self._batch_runner is None:
+            if not self.settings.bedrock_batch_role_arn:
+                raise ValueError("bedrock_batch_role_arn must be set to use batch inference")
+            bedrock = lazy_client('bedrock')
+            self._batch_runner = BedrockBatchRunner(
+                bedrock,
+                self.s3_client,
+                self.settings.s3_bucket,
+                self.settings.s3_bedrock_batch_prefix,
+                self.settings.bedrock_batch_role_arn
+            )
+        return self._batch_runner
+
+    def submit_batch(self, transcripts: Dict[str, str]) -> str:
+        """Start a Bedrock batch inference job for transcripts keyed by record ID; returns the job ARN"""
+        bodies = {
+            record_id: self._request_body(self._get_analysis_prompt(transcript))
+            for record_id, transcript in transcripts.items()
+        }
+        return self.batch_runner.submit(self.MODEL_ID, bodies)
+
+    def collect_batch(self, job_arn: str) -> Dict[str, Dict[str, Any]]:
+        """Parse the analyses of a completed batch job, keyed by record ID"""
+        analyses = {}
+        for record_id, response_body in self.batch_runner.results(job_arn).items():
+            try:
+                analyses[record_id] = self._parse_analysis(response_body)
+            except Exception as e:
+                logger.error(f"Error parsing batch result {record_id}: {e}")
+                analyses[record_id] = self._failed_analysis(e)
+        return analyses
@@ -0,0 +1,319 @@
+import io
+import logging
+import threading
+import time
+import typing
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from app.models.schemas import TranscriptAnalysis
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMNS = ('submission_date', 'car_make')
+
+def _arrow_type(annotation):
+    import pyarrow as pa
+
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        # Optional[X] is nullable X; every column is nullable anyway
+        return _arrow_type(next(arg for arg in typing.get_args(annotation) if arg is not type(None)))
+    if origin in (list, List):
+        return pa.list_(_arrow_type(typing.get_args(annotation)[0]))
+    if annotation is str:
+        return pa.string()
+    if annotation is int:
+        return pa.int32()
+    if annotation is float:
+        return pa.float64()
+    if annotation is bool:
+        return pa.bool_()
+    raise TypeError(f"No Parquet type for {annotation!r}")
+
+def model_fields(model: typing.Type[BaseModel], prefix: str = '') -> List[tuple]:
+    """Flatten a pydantic model into (column name, path, annotation), nested models joined with "_" """
+    fields = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            for column, path, inner in model_fields(annotation, f"{prefix}{name}_"):
+                fields.append((column, (name,) + path, inner))
+        else:
+            fields.append((f"{prefix}{name}", (name,), annotation))
+    return fields
+
+ANALYSIS_FIELDS = model_fields(TranscriptAnalysis)
+
+def analysis_schema():
+    """Arrow schema for submissions: the flattened TranscriptAnalysis plus submission metadata"""
+    import pyarrow as pa
+
+    return pa.schema(
+        [pa.field('submission_id', pa.string(), nullable=False),
+         pa.field('submitted_at', pa.timestamp('ms', tz='UTC'), nullable=False)]
+        + [pa.field(column, _arrow_type(annotation)) for column, _, annotation in ANALYSIS_FIELDS]
+        + [pa.field(partition, pa.string()) for partition in PARTITION_COLUMNS]
+    )
+
+def _lookup(analysis: Dict[str, Any], path: Sequence[str]) -> Any:
+    value: Any = analysis
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def _coerce(value: Any, annotation) -> Any:
+    """Best-effort conversion of model output to the column type; bad values become null"""
+    if value is None:
+        return None
+    arrow_type = str(_arrow_type(annotation))
+    try:
+        if arrow_type.startswith('list'):
+            return [str(item) for item in value] if isinstance(value, list) else [str(value)]
+        if arrow_type == 'int32':
+            return int(value)
+        if arrow_type == 'string':
+            return str(value)
+        return value
+    except (TypeError, ValueError):
+        return None
+
+def partition_value(value: Optional[str]) -> str:
+    """Path-safe partition value"""
+    cleaned = ''.join(c if c.isalnum() or c in '-_' else '_' for c in (value or '').strip().lower())
+    return cleaned or 'unknown'
+
+class S3RangeFile(io.RawIOBase):
+    """Seekable read-only view of an S3 object that fetches each read with a ranged GET"""
+
+    def __init__(self, s3_client, bucket: str, key: str, size: Optional[int] = None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.size = size if size is not None else s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(0, min(offset, self.size))
+        return self._pos
+
+    def readinto(self, target) -> int:
+        count = min(len(target), self.size - self._pos)
+        if count <= 0:
+            return 0
+        response = self.s3_client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={self._pos}-{self._pos + count - 1}"
+        )
+        data = response['Body'].read()
+        target[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+class ParquetSink:
+    """Writes submissions to a Parquet dataset in S3, partitioned by submission date and car make.
+
+    Files use Hive-style paths (``submission_date=2024-05-01/car_make=bmw/``)
+    so readers can skip partitions by listing keys alone, and every column is
+    stored separately so a reader only downloads the columns it asks for.
+    Each call to ``write`` produces at most one file per partition, so live
+    submissions should go through a ``ParquetBuffer``.
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str, compression: str = 'zstd'):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.compression = compression
+
+    def records(self, analyses: Iterable[Dict[str, Any]], submitted_at: datetime) -> List[Dict[str, Any]]:
+        records = []
+        for analysis in analyses:
+            record = {
+                'submission_id': uuid.uuid4().hex,
+                'submitted_at': submitted_at
+            }
+            for column, path, annotation in ANALYSIS_FIELDS:
+                record[column] = _coerce(_lookup(analysis, path), annotation)
+            record['submission_date'] = submitted_at.strftime('%Y-%m-%d')
+            record['car_make'] = partition_value(record.get('vehicle_make'))
+            records.append(record)
+        return records
+
+    def write(self, analyses: List[Dict[str, Any]], submitted_at: Optional[datetime] = None) -> List[str]:
+        """Append analyses to the dataset; returns the keys written"""
+        return self.write_records(self.records(analyses, submitted_at or datetime.now(timezone.utc)))
+
+    def write_records(self, records: List[Dict[str, Any]]) -> List[str]:
+        """Write prepared records, one file per partition; returns the keys written"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        written_at = datetime.now(timezone.utc)
+        partitions: Dict[tuple, List[Dict[str, Any]]] = {}
+        for record in records:
+            partitions.setdefault(tuple(record[column] for column in PARTITION_COLUMNS), []).append(record)
+
+        schema = analysis_schema()
+        # Partition values live in the path, not in the files
+        file_schema = pa.schema([field for field in schema if field.name not in PARTITION_COLUMNS])
+        keys = []
+        for values, rows in partitions.items():
+            table = pa.Table.from_pylist(rows, schema=schema).select(file_schema.names)
+            buffer = io.BytesIO()
+            pq.write_table(table, buffer, compression=self.compression)
+            path = '/'.join(f"{column}={value}" for column, value in zip(PARTITION_COLUMNS, values))
+            key = f"{self.prefix}{path}/part-{written_at.strftime('%H%M%S')}-{uuid.uuid4().hex[:12]}.parquet"
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=buffer.getvalue(),
+                ContentType='application/vnd.apache.parquet'
+            )
+            keys.append(key)
+        logger.info(f"Wrote {len(records)} submission(s) to {len(keys)} Parquet file(s)")
+        return keys
+
+    def _partition_keys(self, dates: Optional[Sequence[str]], makes: Optional[Sequence[str]]) -> List[tuple]:
+        wanted_dates = set(dates) if dates else None
+        wanted_makes = {partition_value(make) for make in makes} if makes else None
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        found = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key']
+                if not key.endswith('.parquet'):
+                    continue
+                parts = dict(
+                    segment.split('=', 1) for segment in key[len(self.prefix):].split('/') if '=' in segment
+                )
+                if wanted_dates is not None and parts.get('submission_date') not in wanted_dates:
+                    continue
+                if wanted_makes is not None and parts.get('car_make') not in wanted_makes:
+                    continue
+                found.append((key, obj.get('Size'), parts))
+        return found
+
+    def read(self, columns: Optional[Sequence[str]] = None, dates: Optional[Sequence[str]] = None,
+             makes: Optional[Sequence[str]] = None):
+        """Read submissions as an Arrow table, downloading only matching partitions and columns"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = analysis_schema()
+        columns = list(columns) if columns else schema.names
+        file_columns = [column for column in columns if column not in PARTITION_COLUMNS]
+        tables = []
+        for key, size, parts in self._partition_keys(dates, makes):
+            # Ranged reads fetch the footer and then only the requested column chunks
+            source = S3RangeFile(self.s3_client, self.bucket, key, size)
+            table = pq.ParquetFile(source).read(columns=file_columns)
+            for partition in PARTITION_COLUMNS:
+                if partition in columns:
+                    table = table.append_column(partition, pa.array([parts.get(partition)] * table.num_rows, pa.string()))
+            tables.append(table.select(columns))
+        if not tables:
+            return schema.empty_table().select(columns)
+        return pa.concat_tables(tables)
+
+class ParquetBuffer:
+    """Write-behind buffer that turns many small submissions into few Parquet files.
+
+    Records are stamped when they are submitted and written together once
+    ``window_seconds`` have passed since the first one (or ``max_rows`` are
+    waiting), so each partition gets one file per window instead of one per
+    submission. A failed write keeps its records for the next flush.
+    """
+
+    def __init__(self, sink: ParquetSink, window_seconds: float = 60.0, max_rows: int = 5000):
+        self.sink = sink
+        self.window_seconds = window_seconds
+        self.max_rows = max_rows
+        self._records: List[Dict[str, Any]] = []
+        self._first_queued: Optional[float] = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="parquet-buffer", daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def submit(self, analyses: List[Dict[str, Any]], submitted_at: Optional[datetime] = None):
+        """Queue analyses for the next flush"""
+        records = self.sink.records(analyses, submitted_at or datetime.now(timezone.utc))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("ParquetBuffer is closed")
+            if not self._records:
+                self._first_queued = time.monotonic()
+            self._records.extend(records)
+            self._condition.notify()
+
+    def flush(self) -> bool:
+        """Write every queued record now; returns False if the write failed"""
+        with self._condition:
+            records = self._take()
+        return self._write(records)
+
+    def close(self):
+        """Flush queued records and stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        records = self._records
+        self._records, self._first_queued = [], None
+        return records
+
+    def _due(self) -> bool:
+        if not self._records:
+            return False
+        return len(self._records) >= self.max_rows or time.monotonic() - self._first_queued >= self.window_seconds
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._due() and not self._closed:
+                    timeout = None
+                    if self._records:
+                        timeout = max(0.0, self._first_queued + self.window_seconds - time.monotonic())
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                records = self._take()
+            self._write(records)
+
+    def _write(self, records: List[Dict[str, Any]]) -> bool:
+        if not records:
+            return True
+        try:
+            self.sink.write_records(records)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing {len(records)} submission(s) to Parquet, keeping them for the next flush: {e}")
+            with self._condition:
+                if not self._records:
+                    self._first_queued = time.monotonic()
+                self._records[:0] = records
+            return False
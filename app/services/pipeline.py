@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.metrics import SESSIONS, SESSIONS_IN_FLIGHT, observe_stage, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Sends a status message to the client
+Notify = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class ProcessingPipeline:
+    """Runs recordings through capture, upload, transcribe, analyze and submit on the event loop.
+
+    Blocking SDK calls run in one bounded thread pool. Each stage has a fixed
+    number of slots, so a slow stage makes later sessions queue in front of
+    it instead of spawning more threads, and the number of sessions in the
+    pipeline at once is capped so overload is reported as "busy".
+    """
+
+    STAGES = ('capture', 'upload', 'analyze', 'submit')
+
+    def __init__(self, recorder, transcriber, llm_analyzer, excel_service,
+                 max_sessions: int = 4, max_workers: int = 16, stage_concurrency: int = 4):
+        self.recorder = recorder
+        self.transcriber = transcriber
+        self.llm_analyzer = llm_analyzer
+        self.excel_service = excel_service
+        self.max_sessions = max_sessions
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        # The server has a single microphone, so only one local capture can run at a time
+        self._stage_slots = {
+            stage: asyncio.Semaphore(1 if stage == 'capture' else stage_concurrency)
+            for stage in self.STAGES
+        }
+        self.active_sessions = 0
+
+    def try_acquire(self) -> bool:
+        """Reserve a session slot; returns False when the pipeline is full"""
+        if self.active_sessions >= self.max_sessions:
+            return False
+        self.active_sessions += 1
+        SESSIONS_IN_FLIGHT.inc()
+        return True
+
+    def release(self):
+        """Return a session slot"""
+        self.active_sessions -= 1
+        SESSIONS_IN_FLIGHT.dec()
+
+    async def _stage(self, stage: str, func, *args, **kwargs):
+        """Run a blocking call in the pool once the stage has a free slot"""
+        async with self._stage_slots[stage]:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def process(self, notify: Notify, on_partial=None, session=None):
+        """Process one recording; the caller must have reserved a slot with try_acquire().
+
+        Audio comes from the browser-fed ``session`` when given, otherwise
+        from the server's microphone.
+        """
+        try:
+            await self._process(notify, on_partial, session)
+        except Exception as e:
+            SESSIONS.inc(outcome='error')
+            logger.error(f"Error during processing: {str(e)}")
+            await notify({
+                "status": "error",
+                "message": f"An error occurred: {str(e)}"
+            })
+        finally:
+            self.release()
+
+    async def _process(self, notify: Notify, on_partial, session):
+        recorder = self.recorder
+        sample_rate = session.sample_rate if session else recorder.sample_rate
+        # Seconds spent in each stage of this session
+        timings: Dict[str, float] = {}
+
+        logger.info("Recording audio...")
+        stream = self.transcriber.start_session(sample_rate, on_partial)
+        with stage_timer('capture', timings):
+            if session:
+                recording = await session.capture(on_chunk=stream.feed)
+            else:
+                recording = await self._stage('capture', recorder.record_audio, on_chunk=stream.feed)
+        finish_started = time.perf_counter()
+        streamed_transcript = await self._stage('upload', stream.finish)
+        if streamed_transcript is not None:
+            # Only a streaming backend transcribes here; batch sessions are timed around the job
+            observe_stage('transcribe', time.perf_counter() - finish_started, timings)
+        if recording is None:
+            SESSIONS.inc(outcome='failed')
+            logger.error("Failed to record audio")
+            await notify({
+                "status": "error",
+                "message": "Failed to record audio. Please try again."
+            })
+            return
+
+        # Capture may have ended on its own (silence or the length cap), so tell the client
+        await notify({"status": "recording_stopped"})
+
+        with stage_timer('encode', timings):
+            captured_seconds = len(recording) / sample_rate
+            recording = await self._stage('upload', recorder.trim_silence, recording, sample_rate)
+            logger.info(f"Trimmed {captured_seconds - len(recording) / sample_rate:.1f}s of silence")
+            buffers = await self._stage('upload', recorder.encode_recording, recording, sample_rate)
+        logger.info("Uploading to S3...")
+        with stage_timer('upload', timings):
+            s3_uri = await self._stage('upload', recorder.upload_encoded, buffers)
+        if not s3_uri:
+            SESSIONS.inc(outcome='failed')
+            logger.error("Failed to upload to S3")
+            await notify({
+                "status": "error",
+                "message": "Failed to upload audio to S3. Please try again."
+            })
+            return
+
+        transcript = streamed_transcript
+        if transcript is None:
+            # No streaming result, fall back to a batch Transcribe job; the job
+            # is awaited on the loop so it does not hold a pool thread
+            logger.info("Starting transcription...")
+            await notify({"status": "transcribing"})
+            with stage_timer('transcribe', timings):
+                transcript = await recorder.transcribe_audio_async(s3_uri, len(recording) / sample_rate)
+        if not transcript:
+            SESSIONS.inc(outcome='failed')
+            logger.error("Transcription failed")
+            await notify({
+                "status": "error",
+                "message": "Failed to transcribe audio. Please try again."
+            })
+            return
+
+        logger.info("Saving transcript to S3...")
+        with stage_timer('upload', timings):
+            transcript_uri = await self._stage(
+                'upload', recorder.save_transcript_to_s3, transcript, recorder.transcript_key_for(s3_uri)
+            )
+
+        logger.info("Analyzing transcript with LLM...")
+        await notify({"status": "analyzing"})
+        if self.llm_analyzer.settings.bedrock_streaming:
+            loop = asyncio.get_running_loop()
+
+            def on_field(field, value):
+                # Runs in the pool thread reading the stream
+                asyncio.run_coroutine_threadsafe(notify({
+                    "status": "partial_analysis",
+                    "field": field,
+                    "value": value
+                }), loop)
+
+            with stage_timer('analyze', timings):
+                analysis = await self._stage('analyze', self.llm_analyzer.analyze_transcript_stream, transcript, on_field)
+        else:
+            with stage_timer('analyze', timings):
+                analysis = await self._stage('analyze', self.llm_analyzer.analyze_transcript, transcript)
+        logger.info(f"Analysis results: {json.dumps(analysis, indent=2)}")
+
+        logger.info("Submitting to Excel in S3...")
+        with stage_timer('submit', timings):
+            excel_submitted = await self._stage('submit', self.excel_service.submit_response, analysis)
+
+        SESSIONS.inc(outcome='success')
+        message = {
+            "status": "success",
+            "transcript": transcript,
+            "audio_uri": s3_uri,
+            "transcript_uri": transcript_uri,
+            "analysis": analysis,
+            "excel_submitted": excel_submitted
+        }
+        if self.llm_analyzer.settings.metrics_session_timings:
+            message["timings"] = timings
+        await notify(message)
+        logger.info("Processing completed successfully")
+
+    def shutdown(self):
+        """Stop accepting work and wait for running calls to finish"""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,245 @@
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bump whenever extraction output changes, so cached local results are not reused
+EXTRACTOR_VERSION = 'v2'
+
+# Analysis fields and the confidence score that covers each of them
+FIELD_CONFIDENCE_KEYS = {
+    'customer': 'name',
+    'vehicle': 'vehicle',
+    'date_of_birth': 'dob',
+    'post_code': 'post_code'
+}
+
+MONTHS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8,
+    'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+_MONTH = r'(january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec)'
+_DAY = r'(\d{1,2})(?:st|nd|rd|th)?'
+_YEAR = r'(\d{4})'
+
+_DATE_PATTERNS = [
+    (re.compile(rf'\b{_DAY}\s+(?:of\s+)?{_MONTH},?\s+{_YEAR}\b', re.I), ('day', 'month', 'year')),
+    (re.compile(rf'\b{_MONTH}\s+{_DAY},?\s+{_YEAR}\b', re.I), ('month', 'day', 'year')),
+    (re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b'), ('year', 'month', 'day')),
+    # UK ordering for numeric dates
+    (re.compile(r'\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b'), ('day', 'month', 'year')),
+]
+
+_DOB_CUE = re.compile(r'\b(date of birth|d\.?o\.?b\b\.?|born on|born|birthday)(?!\w)\s*(is|was)?\s*:?', re.I)
+_POST_CODE_CUE = re.compile(r'(post\s*code|postal code)\s*(is)?\s*:?', re.I)
+_UK_POST_CODE = re.compile(r'^([A-Z]{1,2}\d[A-Z\d]?)(\d[A-Z]{2})')
+_UK_POST_CODE_INLINE = re.compile(r'\b([A-Z]{1,2}\d[A-Z\d]?)\s?(\d[A-Z]{2})\b')
+
+_NAME = r"([A-Za-z][A-Za-z'\-]*)"
+_NAME_CUES = {
+    'first_name': re.compile(rf'\bfirst name\s+(?:is\s+)?{_NAME}', re.I),
+    'middle_name': re.compile(rf'\bmiddle name\s+(?:is\s+)?{_NAME}', re.I),
+    'last_name': re.compile(rf'\b(?:last name|surname|family name)\s+(?:is\s+)?{_NAME}', re.I),
+}
+_FULL_NAME_CUE = re.compile(rf"\b(?:my name is|my name's|this is)\s+{_NAME}\s+{_NAME}(?:\s+{_NAME})?", re.I)
+_NOT_NAMES = {'and', 'my', 'i', 'is', 'the', 'a', 'not', 'calling', 'interested'}
+
+# Makes and the models we recognise for them, in display form
+VEHICLE_GAZETTEER = {
+    'BMW': ['1 Series', '2 Series', '3 Series', '4 Series', '5 Series', '7 Series', '8 Series',
+            'X1', 'X2', 'X3', 'X4', 'X5', 'X6', 'X7', 'Z4', 'i3', 'i4', 'i5', 'i7', 'iX', 'iX1', 'iX3', 'M3', 'M4', 'M5'],
+    'Tesla': ['Model S', 'Model 3', 'Model X', 'Model Y', 'Cybertruck', 'Roadster'],
+    'Audi': ['A1', 'A3', 'A4', 'A5', 'A6', 'A7', 'A8', 'Q2', 'Q3', 'Q4 e-tron', 'Q5', 'Q7', 'Q8', 'e-tron', 'TT', 'R8'],
+    'Mercedes-Benz': ['A-Class', 'B-Class', 'C-Class', 'E-Class', 'S-Class', 'GLA', 'GLB', 'GLC', 'GLE', 'GLS', 'EQA', 'EQB', 'EQC', 'EQE', 'EQS'],
+    'Volkswagen': ['Polo', 'Golf', 'ID.3', 'ID.4', 'ID.5', 'Passat', 'Tiguan', 'T-Roc', 'Touareg'],
+    'Ford': ['Fiesta', 'Focus', 'Puma', 'Kuga', 'Mustang', 'Mustang Mach-E', 'Ranger'],
+    'Toyota': ['Yaris', 'Corolla', 'C-HR', 'RAV4', 'Prius', 'bZ4X', 'Aygo X'],
+    'Nissan': ['Micra', 'Juke', 'Qashqai', 'X-Trail', 'Leaf', 'Ariya'],
+    'Kia': ['Picanto', 'Rio', 'Ceed', 'Niro', 'Sportage', 'Sorento', 'EV6', 'EV9'],
+    'Hyundai': ['i10', 'i20', 'i30', 'Kona', 'Tucson', 'Santa Fe', 'Ioniq 5', 'Ioniq 6'],
+}
+_MAKE_ALIASES = {'mercedes': 'Mercedes-Benz', 'merc': 'Mercedes-Benz', 'vw': 'Volkswagen', 'beemer': 'BMW'}
+
+def _make_pattern(text: str) -> re.Pattern:
+    # Allow spaces or hyphens in either form ("C Class", "C-Class") and stop at word edges
+    parts = [re.escape(part) for part in re.split(r'[\s\-]+', text)]
+    return re.compile(r'(?<![A-Za-z0-9])' + r'[\s\-]?'.join(parts) + r'(?![A-Za-z0-9])', re.I)
+
+_MAKE_PATTERNS = [(make, _make_pattern(make)) for make in VEHICLE_GAZETTEER]
+_MAKE_PATTERNS += [(make, _make_pattern(alias)) for alias, make in _MAKE_ALIASES.items()]
+_MODEL_PATTERNS = {
+    make: sorted(((model, _make_pattern(model)) for model in models), key=lambda item: -len(item[0]))
+    for make, models in VEHICLE_GAZETTEER.items()
+}
+
+def _name_case(name: str) -> str:
+    # Keep the transcript's casing ("McDonald", "O'Brien"); only an all lower-case name is capitalised
+    return name[0].upper() + name[1:] if name.islower() else name
+
+class PreExtractor:
+    """Deterministic regex and gazetteer extraction of the structured transcript fields.
+
+    Produces a ``TranscriptAnalysis``-shaped dict with a confidence score per
+    field, so the LLM only has to handle the fields that fall below a
+    threshold.
+    """
+
+    def __init__(self, today: Optional[date] = None):
+        self.today = today
+
+    def extract(self, transcript: str) -> Dict[str, Any]:
+        ambiguities: List[str] = []
+        customer, name_confidence = self._extract_name(transcript)
+        vehicle, vehicle_confidence = self._extract_vehicle(transcript, ambiguities)
+        dob, dob_confidence = self._extract_dob(transcript, ambiguities)
+        post_code, post_code_confidence = self._extract_post_code(transcript, ambiguities)
+
+        missing_fields = [
+            field for field, value in (
+                ('first_name', customer['first_name']),
+                ('middle_name', customer['middle_name']),
+                ('last_name', customer['last_name']),
+                ('car_make', vehicle['make']),
+                ('car_model', vehicle['model']),
+                ('date_of_birth', dob),
+                ('post_code', post_code)
+            ) if value is None
+        ]
+
+        return {
+            'customer': {
+                'first_name': customer['first_name'] or 'Not provided',
+                'middle_name': customer['middle_name'],
+                'last_name': customer['last_name'] or 'Not provided'
+            },
+            'vehicle': {
+                'make': vehicle['make'] or 'Not provided',
+                'model': vehicle['model'] or 'Not provided'
+            },
+            'date_of_birth': dob or 'Not provided',
+            'post_code': post_code or 'Not provided',
+            'confidence_scores': {
+                'name': name_confidence,
+                'vehicle': vehicle_confidence,
+                'dob': dob_confidence,
+                'post_code': post_code_confidence
+            },
+            'missing_fields': missing_fields,
+            'ambiguities': ambiguities
+        }
+
+    def _extract_name(self, transcript: str) -> Tuple[Dict[str, Optional[str]], int]:
+        names: Dict[str, Optional[str]] = {}
+        for part, pattern in _NAME_CUES.items():
+            matches = [m.group(1) for m in pattern.finditer(transcript) if m.group(1).lower() not in _NOT_NAMES]
+            # Callers correct themselves, so the last mention wins
+            names[part] = _name_case(matches[-1]) if matches else None
+        if names['first_name'] and names['last_name']:
+            return names, 90
+
+        match = _FULL_NAME_CUE.search(transcript)
+        if match:
+            parts = [p for p in match.groups() if p and p.lower() not in _NOT_NAMES]
+            if len(parts) >= 2:
+                return {
+                    'first_name': _name_case(parts[0]),
+                    'middle_name': _name_case(parts[1]) if len(parts) == 3 else None,
+                    'last_name': _name_case(parts[-1])
+                }, 60
+        return names, 30 if names['first_name'] or names['last_name'] else 0
+
+    def _extract_vehicle(self, transcript: str, ambiguities: List[str]) -> Tuple[Dict[str, Optional[str]], int]:
+        makes = []
+        for make, pattern in _MAKE_PATTERNS:
+            for match in pattern.finditer(transcript):
+                makes.append((match.start(), make))
+        if not makes:
+            return {'make': None, 'model': None}, 0
+        makes.sort()
+        distinct = list(dict.fromkeys(make for _, make in makes))
+        make = makes[-1][1]
+        confidence = 90
+        if len(distinct) > 1:
+            ambiguities.append(f"Several car makes mentioned ({', '.join(distinct)}); using the last one")
+            confidence = 50
+
+        model = None
+        for candidate, pattern in _MODEL_PATTERNS[make]:
+            if pattern.search(transcript):
+                model = candidate
+                break
+        if model is None:
+            return {'make': make, 'model': None}, min(confidence, 50)
+        return {'make': make, 'model': model}, confidence
+
+    def _parse_date(self, text: str) -> Optional[Tuple[int, date]]:
+        best = None
+        for pattern, order in _DATE_PATTERNS:
+            for match in pattern.finditer(text):
+                values = dict(zip(order, match.groups()))
+                month = values['month']
+                month = MONTHS.get(month.lower()) if not month.isdigit() else int(month)
+                try:
+                    parsed = date(int(values['year']), month, int(values['day']))
+                except (TypeError, ValueError):
+                    continue
+                if best is None or match.start() < best[0]:
+                    best = (match.start(), parsed)
+        return best
+
+    def _extract_dob(self, transcript: str, ambiguities: List[str]) -> Tuple[Optional[str], int]:
+        found = None
+        confidence = 0
+        for cue in _DOB_CUE.finditer(transcript):
+            parsed = self._parse_date(transcript[cue.end():cue.end() + 40])
+            if parsed and parsed[0] <= 3:
+                found, confidence = parsed[1], 90
+        if found is None:
+            parsed = self._parse_date(transcript)
+            if parsed:
+                found, confidence = parsed[1], 60
+        if found is None:
+            return None, 0
+
+        today = self.today or date.today()
+        age = today.year - found.year - ((today.month, today.day) < (found.month, found.day))
+        if age < 0 or age > 120:
+            ambiguities.append(f"Date of birth {found.isoformat()} is not plausible")
+            confidence = min(confidence, 40)
+        elif age < 16:
+            ambiguities.append(f"Customer appears to be {age}, unreasonably young for a car purchase")
+        elif age < 18:
+            ambiguities.append(f"Customer appears to be {age}, under 18 years old")
+        return found.isoformat(), confidence
+
+    def _extract_post_code(self, transcript: str, ambiguities: List[str]) -> Tuple[Optional[str], int]:
+        candidates = []
+        for cue in _POST_CODE_CUE.finditer(transcript):
+            # Speech often spells post codes out ("S W 1 A 1 A A"), so squash the following text
+            squashed = re.sub(r'[^A-Za-z0-9]', '', transcript[cue.end():cue.end() + 24]).upper()
+            match = _UK_POST_CODE.match(squashed)
+            if match:
+                candidates.append((f"{match.group(1)} {match.group(2)}", 95))
+        if not candidates:
+            for match in _UK_POST_CODE_INLINE.finditer(transcript.upper()):
+                candidates.append((f"{match.group(1)} {match.group(2)}", 70))
+        if not candidates:
+            return None, 0
+
+        distinct = list(dict.fromkeys(code for code, _ in candidates))
+        post_code, confidence = candidates[-1]
+        if len(distinct) > 1:
+            ambiguities.append(f"Several post codes mentioned ({', '.join(distinct)}); using the last one")
+            confidence = min(confidence, 50)
+        return post_code, confidence
+
+def confident_fields(analysis: Dict[str, Any], threshold: int) -> Dict[str, Any]:
+    """Fields whose confidence score meets the threshold"""
+    scores = analysis.get('confidence_scores', {})
+    return {
+        field: analysis[field]
+        for field, score_key in FIELD_CONFIDENCE_KEYS.items()
+        if scores.get(score_key, 0) >= threshold
+    }
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import uuid
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from app.services.audio_buffer import AudioBuffer
+from app.services.vad import SilenceDetector, create_silence_detector
+
+logger = logging.getLogger(__name__)
+
+# Sample rates a browser may report; anything else is rejected before a buffer is sized from it
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+class RecordingSession:
+    """Per-connection recording state fed with 16-bit PCM frames sent by the browser.
+
+    Lives on the event loop: frames arrive from the WebSocket receive loop
+    and ``capture()`` waits on an asyncio event, so an idle caller holds no
+    thread. The buffer is capped at ``max_seconds`` of audio, and capture also
+    stops after a stretch of silence when auto-stop is configured.
+    """
+
+    def __init__(self, sample_rate: int = 16000, max_seconds: int = 300):
+        self.id = uuid.uuid4().hex
+        self.sample_rate = sample_rate
+        self.max_seconds = max_seconds
+        self.recording = False
+        self.buffer: Optional[AudioBuffer] = None
+        self.silence: Optional[SilenceDetector] = None
+        self._on_chunk: Optional[Callable[[np.ndarray], None]] = None
+        self._stopped = asyncio.Event()
+
+    def start(self, sample_rate: Optional[int] = None):
+        """Begin a new recording, discarding any previous audio.
+
+        Raises ValueError when ``sample_rate`` is not a whole number of Hz
+        between MIN_SAMPLE_RATE and MAX_SAMPLE_RATE; the previous rate is kept
+        when it is not given.
+        """
+        if sample_rate is not None:
+            self.sample_rate = self._checked_rate(sample_rate)
+        self.buffer = AudioBuffer(
+            channels=1,
+            dtype=np.int16,
+            initial_frames=self.sample_rate * 10,
+            max_frames=self.sample_rate * self.max_seconds
+        )
+        self.silence = create_silence_detector(self.sample_rate)
+        self._on_chunk = None
+        self._stopped.clear()
+        self.recording = True
+
+    @staticmethod
+    def _checked_rate(sample_rate) -> int:
+        try:
+            rate = float(sample_rate)
+        except (TypeError, ValueError):
+            rate = 0.0
+        if not rate.is_integer() or not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+            raise ValueError(
+                f"Unsupported sample rate {sample_rate!r}, expected {MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE} Hz"
+            )
+        return int(rate)
+
+    def feed(self, payload: bytes):
+        """Append a binary frame of little-endian 16-bit mono PCM"""
+        if not self.recording or not payload:
+            return
+        samples = np.frombuffer(payload[:len(payload) - len(payload) % 2], dtype='<i2')
+        self.buffer.write(samples)
+        if self._on_chunk:
+            self._on_chunk(samples)
+        if self.buffer.full:
+            logger.warning(f"Session {self.id} reached {self.max_seconds}s, stopping capture")
+            self.stop()
+        elif self.silence and self.silence.feed(samples):
+            logger.info(f"Session {self.id} went silent after speech, stopping capture")
+            self.stop()
+
+    def stop(self):
+        """Stop the current recording"""
+        self.recording = False
+        self._stopped.set()
+
+    async def capture(self, on_chunk: Optional[Callable[[np.ndarray], None]] = None) -> Optional[np.ndarray]:
+        """Wait until the recording stops and return its samples (a view, no copy)"""
+        self._on_chunk = on_chunk
+        await self._stopped.wait()
+        self._on_chunk = None
+        if self.buffer is None or not len(self.buffer):
+            return None
+        return self.buffer.view()
+
+class SessionManager:
+    """Creates and tracks independent recording sessions, one per WebSocket"""
+
+    def __init__(self, max_seconds: int = 300):
+        self.max_seconds = max_seconds
+        self.sessions: Dict[str, RecordingSession] = {}
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def create(self) -> RecordingSession:
+        """Register a new session"""
+        session = RecordingSession(max_seconds=self.max_seconds)
+        self.sessions[session.id] = session
+        return session
+
+    def close(self, session: RecordingSession):
+        """Stop a session's capture and forget it"""
+        session.stop()
+        self.sessions.pop(session.id, None)
@@ -0,0 +1,104 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class SubmissionLog:
+    """Append-only log of workbook rows stored as small NDJSON segments in S3"""
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _segment_prefix(self, workbook_key: str) -> str:
+        """Return the S3 prefix holding the segments for a workbook"""
+        return f"{self.prefix}{workbook_key}/"
+
+    def append(self, workbook_key: str, rows: List[Dict[str, Any]]) -> bool:
+        """Write rows as a new segment; cost is independent of workbook size"""
+        if not rows:
+            return True
+        # Nanosecond timestamp first so lexical key order matches append order
+        segment_key = f"{self._segment_prefix(workbook_key)}{time.time_ns():020d}-{uuid.uuid4().hex}.ndjson"
+        body = "\n".join(json.dumps(row, default=str) for row in rows) + "\n"
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=segment_key,
+                Body=body.encode('utf-8'),
+                ContentType='application/x-ndjson'
+            )
+            logger.info(f"Appended {len(rows)} row(s) for {workbook_key} to {segment_key}")
+            return True
+        except Exception as e:
+            logger.error(f"Error appending submission segment for {workbook_key}: {e}")
+            return False
+
+    def list_segments(self, workbook_key: str) -> List[str]:
+        """List pending segment keys for a workbook in append order"""
+        keys = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._segment_prefix(workbook_key)):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return sorted(keys)
+
+    def read_segments(self, segment_keys: List[str]) -> List[Dict[str, Any]]:
+        """Read and decode the rows stored in the given segments"""
+        rows = []
+        for segment_key in segment_keys:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=segment_key)
+            for line in response['Body'].read().decode('utf-8').splitlines():
+                if line.strip():
+                    rows.append(json.loads(line))
+        return rows
+
+    def delete_segments(self, segment_keys: List[str]):
+        """Delete compacted segments (S3 accepts at most 1000 keys per call)"""
+        for start in range(0, len(segment_keys), 1000):
+            chunk = segment_keys[start:start + 1000]
+            self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True}
+            )
+
+class SubmissionCompactor:
+    """Background thread that periodically runs a compaction callable"""
+
+    def __init__(self, compact: Callable[[], Dict[str, int]], interval_seconds: float):
+        self.compact = compact
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the compaction loop if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="submission-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the compaction loop after a final compaction pass"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            self._compact_once()
+        self._compact_once()
+
+    def _compact_once(self):
+        try:
+            counts = self.compact()
+            if any(counts.values()):
+                logger.info(f"Compacted submission log: {counts}")
+        except Exception as e:
+            logger.error(f"Error compacting submission log: {e}")
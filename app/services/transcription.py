@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Called with (text, is_final) whenever the backend has new transcript text
+PartialCallback = Callable[[str, bool], None]
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    """Convert float samples in [-1, 1] to little-endian 16-bit PCM"""
+    if samples.dtype == np.int16:
+        return samples.astype('<i2', copy=False).tobytes()
+    return np.clip(samples * 32767.0, -32768, 32767).astype('<i2').tobytes()
+
+class TranscriptionSession(ABC):
+    """Receives audio while it is being captured"""
+
+    @abstractmethod
+    def feed(self, samples: np.ndarray):
+        """Queue captured samples; must not block the audio callback"""
+
+    @abstractmethod
+    def finish(self) -> Optional[str]:
+        """Flush remaining audio and return the final transcript, or None to fall back to batch"""
+
+class Transcriber(ABC):
+    """Pluggable transcription backend"""
+
+    streaming = False
+
+    @abstractmethod
+    def start_session(self, sample_rate: int, on_partial: Optional[PartialCallback] = None) -> TranscriptionSession:
+        """Open a session that is fed audio during capture"""
+
+class _NullSession(TranscriptionSession):
+    def feed(self, samples: np.ndarray):
+        pass
+
+    def finish(self) -> Optional[str]:
+        return None
+
+class BatchTranscriber(Transcriber):
+    """Ignores live audio so the caller uses the batch Amazon Transcribe job after upload"""
+
+    def start_session(self, sample_rate: int, on_partial: Optional[PartialCallback] = None) -> TranscriptionSession:
+        return _NullSession()
+
+class _AmazonStreamingSession(TranscriptionSession):
+    def __init__(self, region: str, language_code: str, sample_rate: int, on_partial: Optional[PartialCallback]):
+        self.region = region
+        self.language_code = language_code
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self._final_segments: List[str] = []
+        self._error: Optional[Exception] = None
+        self._loop = asyncio.new_event_loop()
+        self._queue: Optional[asyncio.Queue] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="transcribe-stream", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._stream())
+        except Exception as e:
+            logger.error(f"Streaming transcription failed: {e}")
+            self._error = e
+        finally:
+            self._loop.close()
+
+    async def _stream(self):
+        from amazon_transcribe.client import TranscribeStreamingClient
+        from amazon_transcribe.handlers import TranscriptResultStreamHandler
+
+        session = self
+
+        class Handler(TranscriptResultStreamHandler):
+            async def handle_transcript_event(self, transcript_event):
+                for result in transcript_event.transcript.results:
+                    if not result.alternatives:
+                        continue
+                    text = result.alternatives[0].transcript
+                    if not result.is_partial:
+                        session._final_segments.append(text)
+                    if session.on_partial:
+                        session.on_partial(text, not result.is_partial)
+
+        client = TranscribeStreamingClient(region=self.region)
+        stream = await client.start_stream_transcription(
+            language_code=self.language_code,
+            media_sample_rate_hz=self.sample_rate,
+            media_encoding="pcm"
+        )
+
+        async def send_audio():
+            while True:
+                chunk = await self._queue.get()
+                if chunk is None:
+                    break
+                # Coalesce whatever else is already queued into one audio event
+                chunks = [chunk]
+                while not self._queue.empty():
+                    extra = self._queue.get_nowait()
+                    if extra is None:
+                        await stream.input_stream.send_audio_event(audio_chunk=b"".join(chunks))
+                        await stream.input_stream.end_stream()
+                        return
+                    chunks.append(extra)
+                await stream.input_stream.send_audio_event(audio_chunk=b"".join(chunks))
+            await stream.input_stream.end_stream()
+
+        await asyncio.gather(send_audio(), Handler(stream.output_stream).handle_events())
+
+    def feed(self, samples: np.ndarray):
+        if self._error is not None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, to_pcm16(samples))
+        except RuntimeError:
+            # The stream ended between the check and the call
+            pass
+
+    def finish(self) -> Optional[str]:
+        if self._thread.is_alive():
+            try:
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+            except RuntimeError:
+                pass
+        self._thread.join()
+        if self._error is not None:
+            return None
+        return " ".join(self._final_segments).strip() or None
+
+class AmazonStreamingTranscriber(Transcriber):
+    """Amazon Transcribe streaming backend (requires the amazon-transcribe package)"""
+
+    streaming = True
+
+    def __init__(self, region: str, language_code: str = "en-US"):
+        self.region = region
+        self.language_code = language_code
+
+    def start_session(self, sample_rate: int, on_partial: Optional[PartialCallback] = None) -> TranscriptionSession:
+        return _AmazonStreamingSession(self.region, self.language_code, sample_rate, on_partial)
+
+class _FakeStreamingSession(TranscriptionSession):
+    def __init__(self, words: List[str], sample_rate: int, seconds_per_word: float,
+                 on_partial: Optional[PartialCallback]):
+        self.words = words
+        self.samples_per_word = max(1, int(sample_rate * seconds_per_word))
+        self.on_partial = on_partial
+        self._samples = 0
+        self._emitted = 0
+        self._lock = threading.Lock()
+
+    def feed(self, samples: np.ndarray):
+        with self._lock:
+            self._samples += len(samples)
+            available = min(len(self.words), self._samples // self.samples_per_word)
+            if available > self._emitted:
+                self._emitted = available
+                if self.on_partial:
+                    self.on_partial(" ".join(self.words[:available]), False)
+
+    def finish(self) -> Optional[str]:
+        text = " ".join(self.words)
+        if self.on_partial:
+            self.on_partial(text, True)
+        return text or None
+
+class FakeStreamingTranscriber(Transcriber):
+    """Local streaming backend that reveals a scripted transcript one word per interval of audio"""
+
+    streaming = True
+
+    def __init__(self, transcript: str, seconds_per_word: float = 0.3):
+        self.words = transcript.split()
+        self.seconds_per_word = seconds_per_word
+
+    def start_session(self, sample_rate: int, on_partial: Optional[PartialCallback] = None) -> TranscriptionSession:
+        return _FakeStreamingSession(self.words, sample_rate, self.seconds_per_word, on_partial)
+
+def create_transcriber() -> Transcriber:
+    """Build the transcription backend selected by TRANSCRIPTION_BACKEND"""
+    settings = get_settings()
+    backend = settings.transcription_backend
+    if backend == "streaming":
+        try:
+            import amazon_transcribe  # noqa: F401
+        except ImportError:
+            logger.warning("amazon-transcribe is not installed, falling back to batch transcription")
+            return BatchTranscriber()
+        return AmazonStreamingTranscriber(settings.aws_region)
+    if backend == "fake":
+        return FakeStreamingTranscriber(settings.fake_transcript)
+    return BatchTranscriber()
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import uuid
+from concurrent.futures import Executor
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+class TranscriptionJobManager:
+    """Runs batch Amazon Transcribe jobs as coroutines so many can be in flight at once.
+
+    Each job waits on the event loop rather than a dedicated thread. Polling
+    starts after a delay estimated from the audio length and then backs off
+    exponentially, so short clips finish quickly while long jobs do not
+    hammer ``get_transcription_job``.
+    """
+
+    def __init__(self, transcribe_client, executor: Optional[Executor] = None,
+                 min_poll_seconds: float = 1.0, max_poll_seconds: float = 15.0,
+                 backoff: float = 1.5, language_code: str = 'en-US'):
+        self.transcribe_client = transcribe_client
+        self.executor = executor
+        self.min_poll_seconds = min_poll_seconds
+        self.max_poll_seconds = max_poll_seconds
+        self.backoff = backoff
+        self.language_code = language_code
+        self.in_flight: Dict[str, datetime] = {}
+        self._http = requests.Session()
+
+    @staticmethod
+    def new_job_name() -> str:
+        """Timestamped job name with a random suffix so concurrent jobs never collide"""
+        return f"transcription_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}"
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def _initial_delay(self, audio_seconds: Optional[float]) -> float:
+        # Jobs carry a few seconds of queueing overhead plus a fraction of the audio length
+        if audio_seconds is None:
+            return self.min_poll_seconds * 2
+        return min(self.max_poll_seconds, max(self.min_poll_seconds, 2.0 + audio_seconds * 0.25))
+
+    async def start(self, s3_uri: str, media_format: str = 'wav') -> str:
+        """Start a transcription job and return its name"""
+        job_name = self.new_job_name()
+        await self._call(
+            self.transcribe_client.start_transcription_job,
+            TranscriptionJobName=job_name,
+            Media={'MediaFileUri': s3_uri},
+            MediaFormat=media_format,
+            LanguageCode=self.language_code
+        )
+        self.in_flight[job_name] = datetime.now()
+        return job_name
+
+    async def wait(self, job_name: str, audio_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Poll a job with adaptive backoff until it completes or fails"""
+        delay = self._initial_delay(audio_seconds)
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                status = await self._call(self.transcribe_client.get_transcription_job, TranscriptionJobName=job_name)
+                job = status['TranscriptionJob']
+                if job['TranscriptionJobStatus'] in ('COMPLETED', 'FAILED'):
+                    return job
+                delay = min(self.max_poll_seconds, delay * self.backoff)
+        finally:
+            self.in_flight.pop(job_name, None)
+
+    async def fetch_transcript(self, job: Dict[str, Any]) -> Optional[str]:
+        """Download the transcript text of a completed job"""
+        if job['TranscriptionJobStatus'] != 'COMPLETED':
+            logger.error(f"Transcription failed: {job.get('FailureReason', 'Unknown error')}")
+            return None
+        transcript_uri = job['Transcript']['TranscriptFileUri']
+        response = await self._call(self._http.get, transcript_uri, timeout=30)
+        response.raise_for_status()
+        return response.json()['results']['transcripts'][0]['transcript']
+
+    async def transcribe(self, s3_uri: str, media_format: str = 'wav',
+                         audio_seconds: Optional[float] = None) -> Optional[str]:
+        """Start a job, wait for it and return the transcript text"""
+        job_name = await self.start(s3_uri, media_format)
+        job = await self.wait(job_name, audio_seconds)
+        return await self.fetch_transcript(job)
@@ -0,0 +1,132 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.core.metrics import RETRIES
+from app.services.workbook_store import WorkbookConflictError, WorkbookStore
+
+logger = logging.getLogger(__name__)
+
+# Turns a queued item into a row dict once the workbook header is known
+RowPreparer = Callable[[Any, list], Dict[str, Any]]
+
+class _PendingBatch:
+    def __init__(self, columns: list):
+        self.columns = columns
+        self.items: List[Tuple[Any, Optional[RowPreparer]]] = []
+        self.futures: List[Future] = []
+        self.created_at = time.monotonic()
+
+class WorkbookBatcher:
+    """Write-behind layer that coalesces rows per workbook key.
+
+    Rows queued for the same key within ``window_seconds`` (or until
+    ``max_rows`` are waiting) are written in a single read-append-write
+    round-trip. Writes are conditional on the ETag that was read, and a
+    lost race is retried against the fresh object so no row is dropped.
+    """
+
+    def __init__(self, store: WorkbookStore, window_seconds: float = 0.25,
+                 max_rows: int = 500, max_retries: int = 5):
+        self.store = store
+        self.window_seconds = window_seconds
+        self.max_rows = max_rows
+        self.max_retries = max_retries
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="workbook-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, columns: list, rows: List[Any],
+               prepare: Optional[RowPreparer] = None) -> Future:
+        """Queue rows for a workbook; the future resolves to True once they are persisted"""
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("WorkbookBatcher is closed")
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _PendingBatch(columns)
+            batch.items.extend((row, prepare) for row in rows)
+            batch.futures.append(future)
+            self._condition.notify()
+        return future
+
+    def flush(self):
+        """Write every pending batch now"""
+        with self._condition:
+            batches = self._pending
+            self._pending = {}
+        for key, batch in batches.items():
+            self._write_batch(key, batch)
+
+    def close(self):
+        """Flush outstanding rows and stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _take_due_batches(self) -> Dict[str, _PendingBatch]:
+        now = time.monotonic()
+        due = {
+            key: batch for key, batch in self._pending.items()
+            if len(batch.items) >= self.max_rows or now - batch.created_at >= self.window_seconds
+        }
+        for key in due:
+            del self._pending[key]
+        return due
+
+    def _next_timeout(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        oldest = min(batch.created_at for batch in self._pending.values())
+        return max(0.0, oldest + self.window_seconds - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due = self._take_due_batches()
+                while not due and not self._closed:
+                    self._condition.wait(self._next_timeout())
+                    due = self._take_due_batches()
+                if self._closed and not due:
+                    return
+            for key, batch in due.items():
+                self._write_batch(key, batch)
+
+    def _write_batch(self, key: str, batch: _PendingBatch):
+        success = False
+        try:
+            for attempt in range(self.max_retries):
+                df, etag = self.store.read(key, batch.columns)
+                header = df.columns.tolist()
+                rows = [prepare(item, header) if prepare else item for item, prepare in batch.items]
+                df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+                try:
+                    if etag:
+                        self.store.write(df, key, if_match=etag)
+                    else:
+                        self.store.write(df, key, if_none_match='*')
+                    success = True
+                    logger.info(f"Flushed {len(rows)} row(s) to {key} in one write")
+                    break
+                except WorkbookConflictError:
+                    RETRIES.inc(operation='workbook_write')
+                    delay = min(2.0, 0.05 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                    logger.warning(f"Conflict writing {key}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+                    time.sleep(delay)
+            else:
+                logger.error(f"Giving up on {key} after {self.max_retries} conflicting writes")
+        except Exception as e:
+            logger.error(f"Error flushing batch for {key}: {e}")
+
+        for future in batch.futures:
+            future.set_result(success)
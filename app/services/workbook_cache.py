@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.core.config import get_settings
+
+class WorkbookCache:
+    """Bounded LRU cache of parsed workbooks keyed by (bucket, key) and validated by ETag.
+
+    Cached DataFrames are shared between callers and must be treated as
+    read-only; appends go through ``pd.concat`` which returns a new frame.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, pd.DataFrame]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, bucket: str, key: str) -> Optional[Tuple[str, pd.DataFrame]]:
+        """Return the cached (etag, DataFrame) for an object, if any"""
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            if entry is not None:
+                self._entries.move_to_end((bucket, key))
+            return entry
+
+    def put(self, bucket: str, key: str, etag: Optional[str], df: pd.DataFrame):
+        """Store a DataFrame under the ETag it was read or written with"""
+        if not etag or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(bucket, key)] = (etag, df)
+            self._entries.move_to_end((bucket, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, bucket: str, key: str):
+        """Drop an object from the cache"""
+        with self._lock:
+            self._entries.pop((bucket, key), None)
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for monitoring"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries)
+            }
+
+@lru_cache()
+def get_workbook_cache() -> WorkbookCache:
+    """Process-wide cache shared by every WorkbookStore"""
+    return WorkbookCache(get_settings().workbook_cache_max_entries)
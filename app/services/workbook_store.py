@@ -0,0 +1,137 @@
+import io
+import logging
+from typing import Optional, Tuple
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from app.core.config import get_settings
+from app.core.metrics import UPLOADED_BYTES, WORKBOOK_SECONDS
+from app.services.workbook_cache import WorkbookCache, get_workbook_cache
+from app.services.xlsx_stream import MultipartWriter, write_workbook
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+class WorkbookConflictError(Exception):
+    """Raised when a conditional workbook write loses a race with another writer"""
+
+class WorkbookStore:
+    """Reads and writes xlsx workbooks in an S3 bucket, tracking object ETags.
+
+    With ``streaming`` (the default from ``EXCEL_EXPORT_MODE``) workbooks are
+    serialised row by row straight into a multipart upload instead of being
+    built in memory first.
+    """
+
+    def __init__(self, s3_client, bucket: str, cache: Optional[WorkbookCache] = None,
+                 streaming: Optional[bool] = None):
+        settings = get_settings()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.cache = cache if cache is not None else get_workbook_cache()
+        self.streaming = settings.excel_export_mode == 'streaming' if streaming is None else streaming
+        self.part_size = settings.s3_multipart_part_bytes
+        self.max_concurrency = settings.s3_upload_max_concurrency
+
+    def read(self, key: str, columns: list) -> Tuple[pd.DataFrame, Optional[str]]:
+        """Fetch a workbook as a DataFrame along with its ETag (None if missing).
+
+        A cached copy is revalidated with ``If-None-Match`` so an unchanged
+        workbook costs one empty 304 response instead of a download and parse.
+        """
+        with WORKBOOK_SECONDS.time(operation='read'):
+            return self._read(key, columns)
+
+    def _read(self, key: str, columns: list) -> Tuple[pd.DataFrame, Optional[str]]:
+        params = {'Bucket': self.bucket, 'Key': key}
+        cached = self.cache.get(self.bucket, key)
+        if cached:
+            params['IfNoneMatch'] = cached[0]
+        try:
+            response = self.s3_client.get_object(**params)
+        except self.s3_client.exceptions.NoSuchKey:
+            self.cache.invalidate(self.bucket, key)
+            self.cache.record_miss()
+            logger.warning(f"Excel file not found at {key}, creating new one with correct columns")
+            return pd.DataFrame(columns=columns), None
+        except ClientError as e:
+            if cached and e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+                self.cache.record_hit()
+                return cached[1], cached[0]
+            raise
+        self.cache.record_miss()
+        etag = response.get('ETag')
+        buffer = io.BytesIO(response['Body'].read())
+        try:
+            df = pd.read_excel(buffer)
+            self.cache.put(self.bucket, key, etag, df)
+            return df, etag
+        except Exception as excel_error:
+            logger.error(f"Error reading Excel content from {key}: {excel_error}")
+            self.cache.invalidate(self.bucket, key)
+            # Keep the ETag so a corrupted file can still be replaced conditionally
+            return pd.DataFrame(columns=columns), etag
+
+    def write(self, df: pd.DataFrame, key: str, if_match: Optional[str] = None,
+              if_none_match: Optional[str] = None) -> Optional[str]:
+        """Save a DataFrame as a workbook, optionally as a conditional write; returns the new ETag"""
+        with WORKBOOK_SECONDS.time(operation='write'):
+            return self._write(df, key, if_match, if_none_match)
+
+    def _write(self, df: pd.DataFrame, key: str, if_match: Optional[str] = None,
+               if_none_match: Optional[str] = None) -> Optional[str]:
+        conditions = {}
+        if if_match:
+            conditions['IfMatch'] = if_match
+        if if_none_match:
+            conditions['IfNoneMatch'] = if_none_match
+
+        try:
+            if self.streaming:
+                etag, size = self._write_streaming(df, key, conditions)
+            else:
+                etag, size = self._write_buffered(df, key, conditions)
+        except ClientError as e:
+            self.cache.invalidate(self.bucket, key)
+            code = e.response.get('Error', {}).get('Code')
+            if code in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise WorkbookConflictError(f"Workbook {key} was modified concurrently") from e
+            raise
+        UPLOADED_BYTES.inc(size, kind='workbook')
+        # Our own write is now the latest version, so keep serving it from memory
+        self.cache.put(self.bucket, key, etag, df)
+        return etag
+
+    def _write_buffered(self, df: pd.DataFrame, key: str, conditions: dict) -> Tuple[Optional[str], int]:
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False)
+        body = buffer.getvalue()
+        response = self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=body,
+            ContentType=XLSX_CONTENT_TYPE,
+            **conditions
+        )
+        return response.get('ETag'), len(body)
+
+    def _write_streaming(self, df: pd.DataFrame, key: str, conditions: dict) -> Tuple[Optional[str], int]:
+        writer = MultipartWriter(
+            self.s3_client,
+            self.bucket,
+            key,
+            XLSX_CONTENT_TYPE,
+            part_size=self.part_size,
+            max_concurrency=self.max_concurrency,
+            conditions=conditions
+        )
+        try:
+            write_workbook(df, writer)
+        except Exception:
+            writer.abort()
+            raise
+        writer.close()
+        return writer.etag, writer.tell()
@@ -0,0 +1,149 @@
+import io
+import logging
+import math
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from app.services.audio_upload import MIN_PART_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Rows converted to Python values at a time; bounds the extra memory of the conversion
+CHUNK_ROWS = 10_000
+
+class MultipartWriter(io.RawIOBase):
+    """Write-only, forward-only file that streams into an S3 object.
+
+    Bytes are buffered until a part is full and then uploaded in the
+    background, with at most ``max_concurrency`` parts held in memory. An
+    object smaller than one part is sent with a single ``put_object``.
+    ``close`` completes the upload and ``abort`` discards it; the object
+    only appears in S3 once ``close`` succeeds. ``conditions`` (``IfMatch``
+    or ``IfNoneMatch``) apply to that final request.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, content_type: str,
+                 part_size: int = 8 * 1024 * 1024, max_concurrency: int = 4,
+                 conditions: Optional[Dict[str, str]] = None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.conditions = conditions or {}
+        self.etag: Optional[str] = None
+        self._buffer = bytearray()
+        self._written = 0
+        self._upload_id: Optional[str] = None
+        self._parts: List[Future] = []
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._finished = False
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._written
+
+    def write(self, data) -> int:
+        if self._finished:
+            raise ValueError("write to a finished upload")
+        self._buffer += data
+        self._written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def _upload_part(self, data: bytes):
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )['UploadId']
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part")
+        # Wait for the oldest part once the window is full so memory stays bounded
+        pending = [part for part in self._parts if not part.done()]
+        if len(pending) >= self.max_concurrency:
+            pending[0].result()
+        number = len(self._parts) + 1
+        self._parts.append(self._pool.submit(self._send_part, number, data))
+
+    def _send_part(self, number: int, data: bytes) -> Dict[str, Any]:
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=data
+        )
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def close(self):
+        if self._finished or self.closed:
+            super().close()
+            return
+        try:
+            if self._upload_id is None:
+                response = self.s3_client.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer),
+                    ContentType=self.content_type, **self.conditions
+                )
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                parts = [part.result() for part in self._parts]
+                response = self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                    MultipartUpload={'Parts': parts}, **self.conditions
+                )
+                logger.info(f"Uploaded {self._written} bytes to {self.key} in {len(parts)} parts")
+            self.etag = response.get('ETag')
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._finish()
+        super().close()
+
+    def abort(self):
+        """Discard everything written so far"""
+        if self._finished:
+            return
+        try:
+            if self._upload_id is not None:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        finally:
+            self._finish()
+
+    def _finish(self):
+        self._finished = True
+        self._buffer = bytearray()
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+def _cell(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+def write_workbook(df: pd.DataFrame, target, sheet_name: str = 'Sheet1'):
+    """Write ``df`` as an xlsx workbook to ``target`` with a write-only worksheet.
+
+    Rows are appended without creating cell objects and openpyxl spools the
+    sheet to a temporary file, so memory does not grow with the row count.
+    The layout matches ``DataFrame.to_excel(index=False)``: a header row, then
+    one row per record.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append([str(column) for column in df.columns])
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS].astype(object)
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append([_cell(value) for value in row])
+    workbook.save(target)
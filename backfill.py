@@ -0,0 +1,262 @@
+"""Reprocess stored recordings and transcripts through analysis and the workbooks.
+
+    python backfill.py                        # everything under the recordings/transcripts prefixes
+    python backfill.py --limit 100 --concurrency 16 --batch-size 100
+    python backfill.py --dry-run              # list what would be processed
+
+Recordings are paired with transcripts by file name. Older keys carry the time
+each object was written (``YYYYmmdd_HHMMSS...``), so a transcript without a
+same-named recording is paired with the nearest recording made up to
+``--pair-window`` seconds before it. When a transcript exists it is reused;
+otherwise the recording is transcribed and the transcript saved next to the
+others. Each batch is analyzed concurrently (within the
+Bedrock rate limits) and then written to every workbook once. Completed items
+are appended to a checkpoint file, so rerunning after an interruption picks up
+where the last run stopped.
+
+Rows are appended, never replaced: processing a recording again (for example
+after deleting the checkpoint to apply a new prompt) adds a second row for it
+to every workbook.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("backfill")
+
+# Recording and transcript names start with the time they were written
+_STEM_TIME = re.compile(r'^(\d{8}_\d{6})')
+
+def stem_time(stem: str) -> Optional[datetime]:
+    """Timestamp at the start of a file name stem, if any"""
+    match = _STEM_TIME.match(stem)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+    except ValueError:
+        return None
+
+class BackfillItem:
+    """A recording, its transcript, or both, sharing one file name stem"""
+
+    def __init__(self, stem: str):
+        self.stem = stem
+        self.recording_key: Optional[str] = None
+        self.transcript_key: Optional[str] = None
+        self.transcript: Optional[str] = None
+
+class Checkpoint:
+    """Append-only file of completed stems"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    def mark(self, stems: List[str]):
+        if not stems:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(''.join(f"{stem}\n" for stem in stems))
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(stems)
+
+class Backfill:
+    def __init__(self, recorder, llm_analyzer, excel_service, concurrency: int,
+                 transcribe_concurrency: int, batch_size: int, checkpoint: Checkpoint,
+                 pair_window_seconds: float = 1800):
+        self.recorder = recorder
+        self.llm_analyzer = llm_analyzer
+        self.excel_service = excel_service
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.pair_window_seconds = pair_window_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max(concurrency, transcribe_concurrency),
+                                           thread_name_prefix="backfill")
+        self._transcribe_slots = asyncio.Semaphore(transcribe_concurrency)
+        self.counts = {'transcribed': 0, 'reused_transcripts': 0, 'analyzed': 0, 'failed': 0, 'submitted': 0}
+
+    def _list(self, prefix: str) -> List[str]:
+        paginator = self.recorder.s3_client.get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.recorder.bucket_name, Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []) if not obj['Key'].endswith('/'))
+        return keys
+
+    def discover(self) -> List[BackfillItem]:
+        """Pair recordings and transcripts, in name (and so time) order"""
+        items: Dict[str, BackfillItem] = {}
+        for key in self._list(self.recorder.recordings_prefix):
+            stem = os.path.splitext(os.path.basename(key))[0]
+            items.setdefault(stem, BackfillItem(stem)).recording_key = key
+        orphans = []
+        for key in self._list(self.recorder.transcripts_prefix):
+            stem = os.path.splitext(os.path.basename(key))[0]
+            if stem in items:
+                items[stem].transcript_key = key
+            else:
+                orphans.append((stem, key))
+        self._pair_by_time(items, orphans)
+        return [items[stem] for stem in sorted(items)]
+
+    def _pair_by_time(self, items: Dict[str, BackfillItem], orphans: List[tuple]):
+        """Give each unmatched transcript the nearest earlier unmatched recording within the window.
+
+        Transcripts were saved after their recording finished transcribing, so
+        the recording precedes its transcript. When sessions overlapped two
+        transcripts may swap recordings, which is harmless: the transcript is
+        what gets analyzed, and no recording with a transcript is transcribed
+        again.
+        """
+        unmatched = sorted(
+            (recorded, stem) for stem, item in items.items()
+            if item.transcript_key is None and (recorded := stem_time(stem)) is not None
+        )
+        for stem, key in sorted(orphans):
+            saved = stem_time(stem)
+            match = None
+            if saved is not None:
+                for recorded, recording_stem in reversed(unmatched):
+                    if recorded <= saved:
+                        if (saved - recorded).total_seconds() <= self.pair_window_seconds:
+                            match = (recorded, recording_stem)
+                        break
+            if match:
+                unmatched.remove(match)
+                items[match[1]].transcript_key = key
+            else:
+                items.setdefault(stem, BackfillItem(stem)).transcript_key = key
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _read_transcript(self, key: str) -> str:
+        response = self.recorder.s3_client.get_object(Bucket=self.recorder.bucket_name, Key=key)
+        return response['Body'].read().decode('utf-8')
+
+    async def _transcript(self, item: BackfillItem) -> Optional[str]:
+        if item.transcript_key:
+            self.counts['reused_transcripts'] += 1
+            return await self._run(self._read_transcript, item.transcript_key)
+        s3_uri = f"s3://{self.recorder.bucket_name}/{item.recording_key}"
+        async with self._transcribe_slots:
+            transcript = await self.recorder.transcribe_audio_async(s3_uri)
+        if transcript:
+            self.counts['transcribed'] += 1
+            await self._run(self.recorder.save_transcript_to_s3, transcript, self.recorder.transcript_key_for(s3_uri))
+        return transcript
+
+    async def process_batch(self, batch: List[BackfillItem]) -> List[str]:
+        """Transcribe, analyze and submit one batch; returns the stems that completed"""
+        transcripts = await asyncio.gather(*(self._transcript(item) for item in batch), return_exceptions=True)
+        ready = []
+        for item, transcript in zip(batch, transcripts):
+            if isinstance(transcript, Exception) or not transcript:
+                logger.error(f"No transcript for {item.stem}: {transcript or 'transcription failed'}")
+                self.counts['failed'] += 1
+                continue
+            item.transcript = transcript
+            ready.append(item)
+
+        analyses = await self.llm_analyzer.analyze_many([item.transcript for item in ready], self.concurrency)
+        succeeded, good = [], []
+        for item, analysis in zip(ready, analyses):
+            if 'error' in analysis:
+                logger.error(f"Analysis failed for {item.stem}: {analysis['error']}")
+                self.counts['failed'] += 1
+                continue
+            self.counts['analyzed'] += 1
+            succeeded.append(item)
+            good.append(analysis)
+
+        if not good:
+            return []
+        # One append per workbook for the whole batch
+        results = await self._run(self.excel_service.submit_many, good)
+        done = [item.stem for item, result in zip(succeeded, results) if result.get('source_success')]
+        self.counts['submitted'] += len(done)
+        self.counts['failed'] += len(succeeded) - len(done)
+        return done
+
+    async def run(self, items: List[BackfillItem]):
+        started = time.perf_counter()
+        completed = 0
+        try:
+            for offset in range(0, len(items), self.batch_size):
+                batch = items[offset:offset + self.batch_size]
+                done = await self.process_batch(batch)
+                self.checkpoint.mark(done)
+                completed += len(batch)
+                elapsed = time.perf_counter() - started
+                rate = completed / elapsed * 60 if elapsed else 0.0
+                print(f"{completed}/{len(items)} processed, {self.counts['submitted']} submitted, "
+                      f"{self.counts['failed']} failed, {rate:.1f} recordings/min")
+        finally:
+            self.executor.shutdown(wait=True)
+            self.excel_service.close()
+        elapsed = time.perf_counter() - started
+        rate = completed / elapsed * 60 if elapsed else 0.0
+        print(f"Done in {elapsed:.1f}s: {completed} recording(s), {rate:.1f} recordings/min "
+              + ", ".join(f"{name}={count}" for name, count in self.counts.items()))
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=settings.bedrock_max_concurrency,
+                        help="Analyses in flight at once")
+    parser.add_argument('--transcribe-concurrency', type=int, default=4,
+                        help="Transcribe jobs in flight at once")
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help="Recordings per workbook write")
+    parser.add_argument('--checkpoint', default='.cache/backfill.checkpoint',
+                        help="File recording completed items; delete it to start over")
+    parser.add_argument('--pair-window', type=float, default=1800,
+                        help="Seconds a transcript may be saved after its recording when names differ")
+    parser.add_argument('--limit', type=int, help="Process at most this many pending items")
+    parser.add_argument('--dry-run', action='store_true', help="List pending items without processing them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from voice_recorder import VoiceRecorder
+    from app.services.excel_service import ExcelService
+    from app.services.llm_analyzer import LLMAnalyzer
+
+    checkpoint = Checkpoint(args.checkpoint)
+    backfill = Backfill(
+        VoiceRecorder(),
+        LLMAnalyzer(),
+        ExcelService(),
+        concurrency=args.concurrency,
+        transcribe_concurrency=args.transcribe_concurrency,
+        batch_size=args.batch_size,
+        checkpoint=checkpoint,
+        pair_window_seconds=args.pair_window
+    )
+    items = backfill.discover()
+    pending = [item for item in items if item.stem not in checkpoint.done]
+    if args.limit:
+        pending = pending[:args.limit]
+    print(f"{len(items)} item(s) found, {len(items) - len(pending)} already done, {len(pending)} to process")
+    if args.dry_run:
+        for item in pending:
+            print(f"{item.stem}: {'transcript' if item.transcript_key else 'recording'}")
+        return
+    asyncio.run(backfill.run(pending))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""In-process stand-ins for the AWS clients used by the services.
+
+Each fake sleeps ``latency`` seconds per call so network round trips can be
+simulated without a network. Only the operations the services call are
+implemented. Bedrock runtime is covered by ``StubBedrockRuntime`` in
+``app.services.bedrock_engine``.
+"""
+import hashlib
+import io
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+def _error(code: str, operation: str, status: int = 400) -> ClientError:
+    return ClientError(
+        {'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation
+    )
+
+def _body_bytes(body) -> bytes:
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return bytes(body)
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    return body.read()
+
+class _Exceptions:
+    ClientError = ClientError
+
+    class NoSuchKey(ClientError):
+        def __init__(self, operation: str = 'GetObject'):
+            super().__init__({'Error': {'Code': 'NoSuchKey', 'Message': 'Not found'}}, operation)
+
+class _Paginator:
+    def __init__(self, client: "FakeS3"):
+        self.client = client
+
+    def paginate(self, Bucket: str, Prefix: str = '', **kwargs):
+        yield self.client.list_objects_v2(Bucket=Bucket, Prefix=Prefix)
+
+class FakeS3:
+    """Dictionary-backed S3 with ETags and conditional reads and writes"""
+
+    exceptions = _Exceptions
+
+    def __init__(self, latency: float = 0.0, bytes_per_second: Optional[float] = None):
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+        self.objects: Dict[tuple, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._uploads: Dict[str, Dict[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def _op(self, name: str, size: int = 0):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self.latency
+        if self.bytes_per_second and size:
+            delay += size / self.bytes_per_second
+        if delay:
+            time.sleep(delay)
+
+    def _store(self, bucket: str, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self._lock:
+            self.objects[(bucket, key)] = {'Body': data, 'ETag': etag, 'ContentType': content_type,
+                                           'LastModified': datetime.now()}
+            self.bytes_in += len(data)
+        return etag
+
+    def put_object(self, Bucket: str, Key: str, Body=b'', ContentType: Optional[str] = None,
+                   IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None, **kwargs):
+        data = _body_bytes(Body)
+        self._op('put_object', len(data))
+        with self._lock:
+            current = self.objects.get((Bucket, Key))
+            if IfMatch and (current is None or current['ETag'] != IfMatch):
+                raise _error('PreconditionFailed', 'PutObject', 412)
+            if IfNoneMatch == '*' and current is not None:
+                raise _error('PreconditionFailed', 'PutObject', 412)
+        return {'ETag': self._store(Bucket, Key, data, ContentType)}
+
+    def get_object(self, Bucket: str, Key: str, IfNoneMatch: Optional[str] = None,
+                   Range: Optional[str] = None, **kwargs):
+        obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            self._op('get_object')
+            raise _Exceptions.NoSuchKey()
+        if IfNoneMatch and IfNoneMatch == obj['ETag']:
+            self._op('get_object')
+            raise _error('304', 'GetObject', 304)
+        body = obj['Body']
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            body = body[int(start):int(end) + 1]
+        self._op('get_object', len(body))
+        with self._lock:
+            self.bytes_out += len(body)
+        return {'Body': io.BytesIO(body), 'ETag': obj['ETag'], 'ContentLength': len(body)}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs):
+        self._op('head_object')
+        obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            raise _error('404', 'HeadObject', 404)
+        return {'ETag': obj['ETag'], 'ContentLength': len(obj['Body'])}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs):
+        self._op('delete_object')
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: Dict[str, Any], **kwargs):
+        self._op('delete_objects')
+        with self._lock:
+            for item in Delete.get('Objects', []):
+                self.objects.pop((Bucket, item['Key']), None)
+        return {'Deleted': Delete.get('Objects', [])}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = '', **kwargs):
+        self._op('list_objects_v2')
+        with self._lock:
+            contents = [
+                {'Key': key, 'Size': len(obj['Body']), 'ETag': obj['ETag'], 'LastModified': obj['LastModified']}
+                for (bucket, key), obj in sorted(self.objects.items())
+                if bucket == Bucket and key.startswith(Prefix)
+            ]
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
+
+    def get_paginator(self, operation_name: str) -> _Paginator:
+        return _Paginator(self)
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read())
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs):
+        self._op('create_multipart_upload')
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body, **kwargs):
+        data = _body_bytes(Body)
+        self._op('upload_part', len(data))
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = data
+        return {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload,
+                                  IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None, **kwargs):
+        self._op('complete_multipart_upload')
+        with self._lock:
+            current = self.objects.get((Bucket, Key))
+            if IfMatch and (current is None or current['ETag'] != IfMatch):
+                raise _error('PreconditionFailed', 'CompleteMultipartUpload', 412)
+            if IfNoneMatch == '*' and current is not None:
+                raise _error('PreconditionFailed', 'CompleteMultipartUpload', 412)
+            parts = self._uploads.pop(UploadId)
+        data = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+        return {'ETag': self._store(Bucket, Key, data)}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs):
+        self._op('abort_multipart_upload')
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+class FakeTranscribe:
+    """Transcription jobs that complete ``job_seconds`` after they start with a fixed transcript"""
+
+    def __init__(self, transcript: str, job_seconds: float = 0.0, latency: float = 0.0):
+        self.transcript = transcript
+        self.job_seconds = job_seconds
+        self.latency = latency
+        self.jobs: Dict[str, float] = {}
+        self.polls = 0
+
+    def start_transcription_job(self, TranscriptionJobName: str, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.jobs[TranscriptionJobName] = time.monotonic()
+        return {'TranscriptionJob': {'TranscriptionJobName': TranscriptionJobName,
+                                     'TranscriptionJobStatus': 'IN_PROGRESS'}}
+
+    def get_transcription_job(self, TranscriptionJobName: str, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.polls += 1
+        done = time.monotonic() - self.jobs[TranscriptionJobName] >= self.job_seconds
+        job = {'TranscriptionJobName': TranscriptionJobName,
+               'TranscriptionJobStatus': 'COMPLETED' if done else 'IN_PROGRESS'}
+        if done:
+            job['Transcript'] = {'TranscriptFileUri': f"https://transcripts.invalid/{TranscriptionJobName}.json"}
+        return {'TranscriptionJob': job}
+
+class FakeTranscriptHTTP:
+    """Replaces the requests session that downloads finished transcripts"""
+
+    class _Response:
+        status_code = 200
+
+        def __init__(self, transcript: str):
+            self._payload = {'results': {'transcripts': [{'transcript': transcript}]}}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self._payload
+
+    def __init__(self, transcript: str, latency: float = 0.0):
+        self.transcript = transcript
+        self.latency = latency
+
+    def get(self, url: str, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._Response(self.transcript)
@@ -0,0 +1,270 @@
+"""Offline stage benchmarks.
+
+    python -m benchmarks.run                          # all cases, default sizes
+    python -m benchmarks.run --cases excel,audio --rows 1000,10000,100000
+    python -m benchmarks.run --s3-latency 0.03 --bedrock-latency 0.8 --output results.json
+    python -m benchmarks.run --compare baseline.json  # print mean changes against an earlier run
+
+S3, Transcribe and Bedrock runtime are replaced by the in-process fakes in
+``benchmarks.fakes`` (installed through ``app.core.aws.set_client``), so no
+network or credentials are needed. Results are written as JSON so runs on
+different commits can be compared.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Settings are read once, so configure them before any app module is imported
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+os.environ['ANALYSIS_CACHE_BACKEND'] = 'memory'
+os.environ['EXCEL_WRITE_MODE'] = 'direct'
+
+import numpy as np
+import pandas as pd
+
+from app.core import aws
+from app.core.config import get_settings
+from app.services.bedrock_engine import StubBedrockRuntime
+from app.services.json_stream import IncrementalJSONParser
+from benchmarks.fakes import FakeS3, FakeTranscribe, FakeTranscriptHTTP
+
+CASES = ('excel', 'forms', 'audio', 'transcribe', 'llm', 'json')
+
+SAMPLE_ANALYSIS = {
+    "customer": {"first_name": "John", "middle_name": "Paul", "last_name": "Smith"},
+    "vehicle": {"make": "Tesla", "model": "Model 3"},
+    "date_of_birth": "1985-06-15",
+    "post_code": "SW1A 1AA",
+    "confidence_scores": {"name": 95, "vehicle": 90, "dob": 95, "post_code": 90},
+    "missing_fields": [],
+    "ambiguities": []
+}
+
+def measure(func: Callable[[], Any], iterations: int, warmup: int = 1,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """Wall-clock statistics of ``func`` in milliseconds; ``setup`` runs untimed before each call"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'min_ms': round(samples[0], 3),
+        'max_ms': round(samples[-1], 3)
+    }
+
+def sample_rows(count: int, columns: List[str]) -> pd.DataFrame:
+    """A workbook-shaped frame with ``count`` synthetic rows"""
+    index = np.arange(count).astype(str)
+    return pd.DataFrame({column: np.char.add(f"{column[:4]}-", index) for column in columns})
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.settings = get_settings()
+        self.s3 = FakeS3(latency=args.s3_latency, bytes_per_second=args.s3_bandwidth)
+        aws.set_client('s3', self.s3)
+        self.results: List[Dict[str, Any]] = []
+
+    def record(self, name: str, params: Dict[str, Any], stats: Dict[str, float],
+               units: Optional[float] = None, unit: Optional[str] = None, **extra):
+        result = {'name': name, 'params': params, **stats, **extra}
+        if units is not None:
+            result[f'{unit}_per_second'] = round(units / (stats['mean_ms'] / 1000), 2)
+        self.results.append(result)
+        print(f"{name:<22}{json.dumps(params):<46}{stats['mean_ms']:>10.1f} ms", file=sys.stderr)
+
+    def _seed_workbook(self, store, key: str, rows: int, columns: List[str]):
+        store.write(sample_rows(rows, columns), key)
+
+    def bench_excel(self):
+        from app.services.excel_service import ExcelService
+        from app.services.workbook_cache import WorkbookCache
+        from app.services.workbook_store import WorkbookStore
+        service = ExcelService()
+        for rows in self.args.rows:
+            for key, columns in service._workbooks().items():
+                self._seed_workbook(service.store, key, rows, columns)
+            stats = measure(lambda: service.submit_response(SAMPLE_ANALYSIS), self.args.iterations)
+            self.record('excel_submit', {'rows': rows}, stats, units=1, unit='submissions')
+            batch = [SAMPLE_ANALYSIS] * self.args.batch
+            stats = measure(lambda: service.submit_many(batch), self.args.iterations)
+            self.record('excel_submit_many', {'rows': rows, 'batch': self.args.batch}, stats,
+                        units=self.args.batch, unit='submissions')
+            frame = sample_rows(rows, service.SOURCE_COLUMNS)
+            for mode in ('buffered', 'streaming'):
+                store = WorkbookStore(self.s3, self.settings.s3_bucket, cache=WorkbookCache(0),
+                                      streaming=mode == 'streaming')
+                stats = measure(lambda: store.write(frame, 'benchmark/export.xlsx'), self.args.iterations)
+                self.record('excel_export', {'rows': rows, 'mode': mode}, stats, units=rows, unit='rows')
+
+    def bench_forms(self):
+        from app.services.form_mapper import FormMapper
+        mapper = FormMapper()
+        for rows in self.args.rows:
+            for file_name in ('MSForm1.xlsx', 'MSForm2.xlsx'):
+                self._seed_workbook(mapper.store, f"{mapper.forms_prefix}{file_name}", rows, mapper.DEFAULT_COLUMNS)
+            stats = measure(lambda: mapper.submit_to_forms(SAMPLE_ANALYSIS), self.args.iterations)
+            self.record('form_mapper_submit', {'rows': rows}, stats, units=1, unit='submissions')
+
+    def bench_audio(self):
+        from voice_recorder import VoiceRecorder
+        recorder = VoiceRecorder()
+        rng = np.random.default_rng(0)
+        for seconds in self.args.seconds:
+            recording = (rng.standard_normal((recorder.sample_rate * seconds, 1)) * 0.1).astype(np.float32)
+            params = {'seconds': seconds, 'encoding': recorder.encoder.encoding}
+            paths = []
+            stats = measure(
+                lambda: paths.append(recorder.save_audio(recording, "recording.wav")),
+                self.args.iterations
+            )
+            size = os.path.getsize(paths[-1])
+            for path in paths:
+                os.unlink(path)
+            self.record('audio_save', params, stats, units=seconds, unit='audio_seconds', bytes=size)
+            before = self.s3.bytes_in
+            stats = measure(lambda: recorder.upload_recording(recording), self.args.iterations)
+            uploaded = (self.s3.bytes_in - before) // (self.args.iterations + 1)
+            self.record('audio_upload', params, stats, units=seconds, unit='audio_seconds', bytes=uploaded)
+
+    def bench_transcribe(self):
+        from app.services.transcription_jobs import TranscriptionJobManager
+        transcript = self.settings.fake_transcript
+        for seconds in self.args.seconds:
+            job_seconds = seconds * self.args.transcribe_factor
+            client = FakeTranscribe(transcript, job_seconds=job_seconds, latency=self.args.s3_latency)
+            manager = TranscriptionJobManager(client)
+            manager._http = FakeTranscriptHTTP(transcript, latency=self.args.s3_latency)
+            run = lambda: asyncio.run(manager.transcribe('s3://bucket/recording.wav', audio_seconds=seconds))
+            stats = measure(run, 1, warmup=0)
+            self.record('transcribe_job', {'seconds': seconds, 'job_seconds': round(job_seconds, 2)}, stats,
+                        overshoot_ms=round(stats['mean_ms'] - job_seconds * 1000, 1), polls=client.polls)
+
+    def bench_llm(self):
+        from app.services.llm_analyzer import LLMAnalyzer
+        response = json.dumps(SAMPLE_ANALYSIS)
+        runtime = StubBedrockRuntime(lambda body: response, latency=self.args.bedrock_latency)
+        analyzer = LLMAnalyzer(runtime)
+        base = self.settings.fake_transcript
+        for pre_extraction in (False, True):
+            self.settings.pre_extraction_enabled = pre_extraction
+            counter = iter(range(10 ** 9))
+            # A fresh transcript every call so the analysis cache never answers
+            run = lambda: analyzer.analyze_transcript(f"{base} Reference {next(counter)}.")
+            calls = runtime.calls
+            stats = measure(run, self.args.iterations)
+            self.record('llm_analyze', {'pre_extraction': pre_extraction}, stats, units=1, unit='analyses',
+                        bedrock_calls=runtime.calls - calls)
+        self.settings.pre_extraction_enabled = True
+
+    def bench_json(self):
+        from app.services.llm_analyzer import LLMAnalyzer
+        text = f"Here is the analysis:\n{json.dumps(SAMPLE_ANALYSIS, indent=2)}\nLet me know if you need more."
+        body = {'content': [{'type': 'text', 'text': text}]}
+        analyzer = LLMAnalyzer(StubBedrockRuntime())
+        batch = 1000
+        stats = measure(lambda: [analyzer._parse_analysis(body) for _ in range(batch)], self.args.iterations)
+        self.record('json_parse', {'batch': batch}, stats, units=batch, unit='responses')
+
+        def stream():
+            for _ in range(batch):
+                parser = IncrementalJSONParser()
+                for i in range(0, len(text), 16):
+                    parser.feed(text[i:i + 16])
+        stats = measure(stream, self.args.iterations)
+        self.record('json_stream_parse', {'batch': batch, 'chunk': 16}, stats, units=batch, unit='responses')
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """Print the mean latency change of each result against a baseline run"""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in json.load(f)['results']}
+    print(f"{'case':<22}{'params':<46}{'before ms':>11}{'after ms':>11}{'change':>9}", file=sys.stderr)
+    for result in results:
+        before = baseline.get((result['name'], json.dumps(result['params'], sort_keys=True)))
+        if not before:
+            continue
+        change = (result['mean_ms'] - before['mean_ms']) / before['mean_ms'] * 100
+        print(f"{result['name']:<22}{json.dumps(result['params']):<46}"
+              f"{before['mean_ms']:>11.1f}{result['mean_ms']:>11.1f}{change:>+8.1f}%", file=sys.stderr)
+
+def int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(',') if part]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', default=','.join(CASES), help=f"Comma-separated subset of {', '.join(CASES)}")
+    parser.add_argument('--rows', type=int_list, default=[1000, 10000], help="Workbook sizes in rows")
+    parser.add_argument('--seconds', type=int_list, default=[10, 60, 300], help="Recording lengths in seconds")
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=50, help="Analyses per submit_many call")
+    parser.add_argument('--s3-latency', type=float, default=0.0, help="Seconds added to every S3 call")
+    parser.add_argument('--s3-bandwidth', type=float, default=None, help="Simulated S3 bytes per second")
+    parser.add_argument('--bedrock-latency', type=float, default=0.0, help="Seconds added to every Bedrock call")
+    parser.add_argument('--transcribe-factor', type=float, default=0.05,
+                        help="Simulated Transcribe job time as a fraction of the audio length")
+    parser.add_argument('--output', help="Write results JSON here instead of stdout")
+    parser.add_argument('--compare', help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    cases = [case for case in args.cases.split(',') if case]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(sorted(unknown))}")
+
+    # Per-call INFO logging from the services would dominate the timings
+    logging.disable(logging.INFO)
+    bench = Bench(args)
+    for case in cases:
+        getattr(bench, f'bench_{case}')()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            's3_latency': args.s3_latency,
+            's3_bandwidth': args.s3_bandwidth,
+            'bedrock_latency': args.bedrock_latency,
+            'transcribe_factor': args.transcribe_factor
+        },
+        'results': bench.results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        compare(bench.results, args.compare)
+
+if __name__ == "__main__":
+    main()
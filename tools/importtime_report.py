@@ -0,0 +1,116 @@
+"""Import-time and startup report for the server.
+
+    python tools/importtime_report.py                 # per-package table for importing app.py
+    python tools/importtime_report.py --module voice_recorder --top 30
+    python tools/importtime_report.py --serve         # also time until GET / answers
+    python tools/importtime_report.py --json
+
+The table digests ``python -X importtime`` output: the self time of every
+module is summed per top-level package, and the cumulative column is the
+package's largest single cumulative import.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loads app.py under a name other than __main__ so uvicorn.run() is not called
+IMPORT_APP = "import runpy; runpy.run_path('app.py', run_name='server')"
+SERVE_APP = (
+    "import runpy, uvicorn; app = runpy.run_path('app.py', run_name='server')['app']; "
+    "uvicorn.run(app, host='127.0.0.1', port={port}, log_level='warning')"
+)
+
+def import_times(statement: str) -> List[Dict]:
+    """Run ``statement`` under -X importtime and parse one record per imported module"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-2000:])
+        raise SystemExit(f"Import failed with exit code {result.returncode}")
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        records.append({
+            'module': name.strip(),
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000
+        })
+    return records
+
+def by_package(records: List[Dict]) -> List[Dict]:
+    """Sum self time per top-level package, slowest first"""
+    packages = defaultdict(lambda: {'self_ms': 0.0, 'cumulative_ms': 0.0, 'modules': 0})
+    for record in records:
+        package = packages[record['module'].split('.')[0]]
+        package['self_ms'] += record['self_ms']
+        package['cumulative_ms'] = max(package['cumulative_ms'], record['cumulative_ms'])
+        package['modules'] += 1
+    rows = [dict(package=name, **values) for name, values in packages.items()]
+    return sorted(rows, key=lambda row: row['self_ms'], reverse=True)
+
+def time_to_first_response(timeout: float = 60.0) -> float:
+    """Start the server on a free port and measure seconds until GET / succeeds"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    command = SERVE_APP.format(port=port)
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-c', command], cwd=ROOT)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise SystemExit(f"Server did not answer within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', help="Module to import instead of app.py")
+    parser.add_argument('--top', type=int, default=20, help="Number of packages to show")
+    parser.add_argument('--serve', action='store_true', help="Also measure time to the first / response")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    statement = f"import {args.module}" if args.module else IMPORT_APP
+    records = import_times(statement)
+    packages = by_package(records)
+    report = {
+        'target': args.module or 'app.py',
+        'modules': len(records),
+        'total_self_ms': round(sum(record['self_ms'] for record in records), 1),
+        'packages': packages[:args.top]
+    }
+    if args.serve:
+        report['first_response_seconds'] = round(time_to_first_response(), 3)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['target']}: {report['modules']} modules, {report['total_self_ms']:.1f} ms total import time")
+    print(f"{'package':<32}{'self ms':>10}{'cumul ms':>10}{'modules':>9}")
+    for row in report['packages']:
+        print(f"{row['package']:<32}{row['self_ms']:>10.1f}{row['cumulative_ms']:>10.1f}{row['modules']:>9}")
+    if args.serve:
+        print(f"First / response after {report['first_response_seconds']:.3f}s")
+
+if __name__ == "__main__":
+    main()
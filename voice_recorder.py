@@ -1,18 +1,20 @@
-import sounddevice as sd
 import numpy as np
 import wave
-import boto3
 import os
+import uuid
 from datetime import datetime
-from scipy.io.wavfile import write
-import tempfile
 import threading
-import queue
 import json
 import time
 import base64
-import requests
+import asyncio
+from app.core.aws import lazy_client
 from app.core.config import get_settings
+from app.services.audio_buffer import AudioBuffer
+from app.services.audio_encoding import AudioEncoder, media_format_for
+from app.services.audio_upload import AudioUploader
+from app.services.transcription_jobs import TranscriptionJobManager
+from app.services.vad import create_silence_detector, create_voice_activity_detector
 
 class VoiceRecorder:
     def __init__(self):
@@ -21,55 +23,96 @@ class VoiceRecorder:
         self.channels = 1  # Mono audio
         self.recording = False
         self.stream = None
-        self.frames = []
+        self.encoder = AudioEncoder(self.settings.audio_encoding, self.settings.audio_upload_sample_rate)
+        self._stop_event = threading.Event()
         
         # Initialize AWS clients
-        self.s3_client = boto3.client('s3',
-            aws_access_key_id=self.settings.aws_access_key_id,
-            aws_secret_access_key=self.settings.aws_secret_access_key,
-            region_name=self.settings.aws_region
-        )
+        self.s3_client = lazy_client('s3')
         
         self.bucket_name = self.settings.s3_bucket
         self.recordings_prefix = self.settings.s3_recordings_prefix
         self.transcripts_prefix = self.settings.s3_transcripts_prefix
-        self.transcribe = boto3.client('transcribe')
-        self.audio_queue = queue.Queue()
+        self.transcribe = lazy_client('transcribe')
+        self.transcription_jobs = TranscriptionJobManager(self.transcribe)
+        self.uploader = AudioUploader(
+            self.s3_client,
+            self.bucket_name,
+            multipart_threshold=self.settings.s3_multipart_threshold_bytes,
+            part_size=self.settings.s3_multipart_part_bytes,
+            max_concurrency=self.settings.s3_upload_max_concurrency
+        )
 
-    def record_audio(self):
-        """Record audio until stop is called"""
+    def record_audio(self, on_chunk=None):
+        """Record audio until stop is called, passing each captured block to on_chunk if given"""
+        # Preallocate 30 seconds; the buffer grows if the caller keeps talking
+        buffer = AudioBuffer(self.channels, initial_frames=self.sample_rate * 30)
+        silence = create_silence_detector(self.sample_rate)
+        self._stop_event.clear()
         self.recording = True
-        frames = []
         
         def callback(indata, frames, time, status):
             if status:
                 print(f"Error in callback: {status}")
             if self.recording:
-                self.audio_queue.put(indata.copy())
+                buffer.write(indata)
+                if on_chunk:
+                    on_chunk(indata)
+                if silence and silence.feed(indata):
+                    print("Silence after speech, stopping recording")
+                    self.stop_recording()
             
+        # PortAudio is only loaded when the server microphone is actually used
+        import sounddevice as sd
+        
         with sd.InputStream(samplerate=self.sample_rate, channels=self.channels, callback=callback):
-            while self.recording:
-                if not self.audio_queue.empty():
-                    frames.append(self.audio_queue.get())
+            # Block until stop_recording() instead of polling
+            self._stop_event.wait()
         
-        if frames:
-            return np.concatenate(frames)
+        if len(buffer):
+            return buffer.view()
         return None
 
     def stop_recording(self):
         """Stop the recording"""
         self.recording = False
+        self._stop_event.set()
+
+    def save_audio(self, recording, filename, sample_rate=None):
+        """Encode recording to a temporary file in the configured upload format"""
+        path, _ = self.encoder.encode(recording, sample_rate or self.sample_rate)
+        return path
+
+    def trim_silence(self, recording, sample_rate=None):
+        """Drop leading and trailing silence (a view, no copy) when trimming is enabled"""
+        if not self.settings.vad_trim_enabled:
+            return recording
+        return create_voice_activity_detector(sample_rate or self.sample_rate).trim(recording)
+
+    def encode_recording(self, recording, sample_rate=None):
+        """Encode recording in memory in the configured upload format"""
+        buffers, _ = self.encoder.encode_buffers(recording, sample_rate or self.sample_rate)
+        return buffers
+
+    def upload_encoded(self, buffers, object_name=None):
+        """Upload encoded audio straight from its buffers"""
+        if object_name is None:
+            object_name = f"{self.recordings_prefix}{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}{self.encoder.extension}"
+        
+        try:
+            return self.uploader.upload(buffers, object_name, self.encoder.content_type)
+        except Exception as e:
+            print(f"Error uploading to S3: {e}")
+            return None
 
-    def save_audio(self, recording, filename):
-        """Save recording to WAV file"""
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            write(temp_file.name, self.sample_rate, recording)
-            return temp_file.name
+    def upload_recording(self, recording, sample_rate=None, object_name=None):
+        """Encode recording in memory and upload it straight from the sample buffer"""
+        return self.upload_encoded(self.encode_recording(recording, sample_rate), object_name)
 
     def upload_to_s3(self, file_path, object_name=None):
         """Upload file to S3 bucket"""
         if object_name is None:
-            object_name = f"{self.recordings_prefix}{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
+            extension = os.path.splitext(file_path)[1] or '.wav'
+            object_name = f"{self.recordings_prefix}{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}{extension}"
         
         try:
             self.s3_client.upload_file(file_path, self.bucket_name, object_name)
@@ -78,43 +121,31 @@ class VoiceRecorder:
             print(f"Error uploading to S3: {e}")
             return None
 
-    def transcribe_audio(self, s3_uri):
+    def transcribe_audio(self, s3_uri, audio_seconds=None):
         """Transcribe audio using Amazon Transcribe"""
         try:
-            job_name = f"transcription_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            self.transcribe.start_transcription_job(
-                TranscriptionJobName=job_name,
-                Media={'MediaFileUri': s3_uri},
-                MediaFormat='wav',
-                LanguageCode='en-US'
-            )
-            
-            # Wait for the job to complete
-            while True:
-                status = self.transcribe.get_transcription_job(TranscriptionJobName=job_name)
-                if status['TranscriptionJob']['TranscriptionJobStatus'] in ['COMPLETED', 'FAILED']:
-                    break
-                time.sleep(2)
-            
-            if status['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED':
-                # Get the transcript
-                transcript_uri = status['TranscriptionJob']['Transcript']['TranscriptFileUri']
-                response = requests.get(transcript_uri)
-                transcript_data = response.json()
-                return transcript_data['results']['transcripts'][0]['transcript']
-            else:
-                print(f"Transcription failed: {status['TranscriptionJob'].get('FailureReason', 'Unknown error')}")
-                return None
-            
+            return asyncio.run(self.transcribe_audio_async(s3_uri, audio_seconds))
         except Exception as e:
             print(f"Error transcribing audio: {e}")
             return None
 
+    async def transcribe_audio_async(self, s3_uri, audio_seconds=None):
+        """Transcribe audio without tying up a thread while the job runs"""
+        return await self.transcription_jobs.transcribe(
+            s3_uri,
+            media_format=media_format_for(s3_uri),
+            audio_seconds=audio_seconds
+        )
+
+    def transcript_key_for(self, s3_uri):
+        """Transcript key sharing the recording's name, so the two can be paired later"""
+        stem = os.path.splitext(s3_uri.rsplit('/', 1)[-1])[0]
+        return f"{self.transcripts_prefix}{stem}.txt"
+
     def save_transcript_to_s3(self, transcript, object_name=None):
         """Save transcript to S3"""
         if object_name is None:
-            object_name = f"{self.transcripts_prefix}{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            object_name = f"{self.transcripts_prefix}{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.txt"
         
         try:
             self.s3_client.put_object(
@@ -133,11 +164,8 @@ def main():
     # Record audio
     recording = recorder.record_audio()
     
-    # Save audio to temporary file
-    audio_file = recorder.save_audio(recording, "recording.wav")
-    
     # Upload to S3
-    s3_uri = recorder.upload_to_s3(audio_file)
+    s3_uri = recorder.upload_recording(recording)
     if s3_uri:
         print(f"Audio uploaded to {s3_uri}")
         
@@ -147,7 +175,7 @@ def main():
             print(f"Transcript: {transcript}")
             
             # Save transcript to S3
-            transcript_uri = recorder.save_transcript_to_s3(transcript)
+            transcript_uri = recorder.save_transcript_to_s3(transcript, recorder.transcript_key_for(s3_uri))
             if transcript_uri:
                 print(f"Transcript saved to {transcript_uri}")
 